@@ -0,0 +1,85 @@
+import os, sys
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import threshold_crypto as tc
+
+TIMING_ROUNDS = 200
+CURVE_NAMES = ["P-256", "Ed25519", tc.LIBSODIUM_ED25519]
+TP = tc.ThresholdParameters(10, 20)
+
+
+def eval_performance(task, curve_name, func, timing_rounds=TIMING_ROUNDS, **kwargs):
+    start = time.perf_counter()
+    for _ in range(timing_rounds):
+        func(**kwargs)
+    stop = time.perf_counter()
+    print(
+        "{:<20} {:<20} {:>10.3f} ms".format(
+            task, curve_name, (stop - start) / timing_rounds * 1000
+        )
+    )
+
+
+def eval_backend(curve_name):
+    cp = tc.CurveParameters(curve_name)
+    pub_key, shares = tc.create_public_key_and_shares_centralized(cp, TP)
+    new_pub_key, new_shares = tc.create_public_key_and_shares_centralized(cp, TP)
+    em = tc.encrypt_message("a" * 1024, pub_key)
+    pds = [tc.compute_partial_decryption(em, share) for share in shares[: TP.t]]
+
+    old_x = [share.x for share in shares[: TP.t]]
+    new_x = [share.x for share in new_shares[: TP.t]]
+    prek = [
+        tc.compute_partial_re_encryption_key(
+            shares[i],
+            tc.lagrange_coefficient_for_key_share_indices(old_x, old_x[i], cp),
+            new_shares[i],
+            tc.lagrange_coefficient_for_key_share_indices(new_x, new_x[i], cp),
+        )
+        for i in range(TP.t)
+    ]
+    re_key = tc.combine_partial_re_encryption_keys(prek, pub_key, new_pub_key, TP, TP)
+
+    eval_performance(
+        "CKG",
+        curve_name,
+        tc.create_public_key_and_shares_centralized,
+        timing_rounds=10,
+        curve_params=cp,
+        threshold_params=TP,
+    )
+    eval_performance(
+        "Encrypt", curve_name, tc.encrypt_message, message="a", public_key=pub_key
+    )
+    eval_performance(
+        "PartialDecryption",
+        curve_name,
+        tc.compute_partial_decryption,
+        encrypted_message=em,
+        key_share=shares[0],
+    )
+    eval_performance(
+        "DecryptCombine",
+        curve_name,
+        tc.decrypt_message,
+        partial_decryptions=pds,
+        encrypted_message=em,
+        threshold_params=TP,
+    )
+    eval_performance(
+        "ReEncrypt", curve_name, tc.re_encrypt_message, em=em, re_key=re_key
+    )
+
+
+def main():
+    print("Threshold parameters: {}".format(TP))
+    for curve_name in CURVE_NAMES:
+        eval_backend(curve_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os, sys
+import tracemalloc
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import threshold_crypto as tc
+
+OBJECT_COUNT = 10000
+TP = tc.ThresholdParameters(3, 5)
+
+
+def dict_class(cls):
+    # the baseline: a plain class storing the same attributes in its __dict__ instead of __slots__
+    attributes = cls.__slots__
+
+    def __init__(self, *values):
+        for attribute, value in zip(attributes, values):
+            setattr(self, attribute, value)
+
+    return type(cls.__name__ + "Dict", (), {"__init__": __init__})
+
+
+def measure(create):
+    # the objects share their points and curve parameters, so only the memory of the objects themselves is measured
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objects = [create(i) for i in range(OBJECT_COUNT)]
+    stop = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # the list holding the objects is not part of their size
+    return (stop - start - sys.getsizeof(objects)) / len(objects)
+
+
+def eval_memory(cls, arguments, baseline_arguments=None):
+    baseline = dict_class(cls)
+    before = measure(lambda i: baseline(*(baseline_arguments or arguments)(i)))
+    after = measure(lambda i: cls(*arguments(i)))
+    print(
+        "{:<25} {:>10.1f} {:>10.1f} {:>9.0f}%".format(
+            cls.__name__, before, after, 100 * (before - after) / before
+        )
+    )
+
+
+def main():
+    cp = tc.CurveParameters()
+    pub_key, shares = tc.create_public_key_and_shares_centralized(cp, TP)
+    em = tc.encrypt_message("a", pub_key)
+    pd = tc.compute_partial_decryption(em, shares[0])
+    lc = tc.lagrange_coefficients([1, 2, 3], cp)[0]
+
+    print("Memory per object in bytes ({} objects)".format(OBJECT_COUNT))
+    print(
+        "{:<25} {:>10} {:>10} {:>10}".format("", "__dict__", "__slots__", "reduction")
+    )
+    eval_memory(tc.KeyShare, lambda i: (i, shares[0].y, cp))
+    eval_memory(tc.PartialDecryption, lambda i: (i, pd.yC1, cp))
+    eval_memory(tc.EncryptedMessage, lambda i: (em.C1, em.C2, em.ciphertext, None))
+    # before, each coefficient held its own copy of the index set
+    eval_memory(
+        tc.LagrangeCoefficient,
+        lambda i: (i, lc.used_index_values, lc.coefficient),
+        lambda i: (i, set(lc.used_index_values), lc.coefficient),
+    )
+    eval_memory(tc.DkgSijValue, lambda i: (i, i + 1, shares[0].y))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,3 +2,4 @@ from .participant import *
 from .central import *
 from .data import *
 from .number import *
+from .group import *
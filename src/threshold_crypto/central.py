@@ -1,5 +1,27 @@
-from typing import List
+import collections
+import functools
+import io
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableSequence,
+    Optional,
+    Tuple,
+    Union,
+)
 
+import nacl.bindings
 import nacl.utils
 import nacl.secret
 import nacl.encoding
@@ -13,17 +35,20 @@ from threshold_crypto.data import (
     KeyShare,
     PartialDecryption,
     EncryptedMessage,
+    MultiRecipientEncryptedMessage,
     ThresholdCryptoError,
     PartialReEncryptionKey,
     ReEncryptionKey,
     PublicKey,
     LagrangeCoefficient,
 )
-from threshold_crypto import number
+from threshold_crypto import group, number
 
 
 # key generation
 
+DEFAULT_SHARE_BATCH_SIZE = 1024
+
 
 def create_public_key_and_shares_centralized(
     curve_params: CurveParameters, threshold_params: ThresholdParameters
@@ -35,18 +60,81 @@ def create_public_key_and_shares_centralized(
     :param threshold_params: parameters t and n for the threshold scheme
     :return: (the public key, n key shares)
     """
+    pk, share_batches = create_public_key_and_share_batches_centralized(
+        curve_params, threshold_params
+    )
+    shares = [share for batch in share_batches for share in batch]
+
+    return pk, shares
+
+
+def create_public_key_and_share_batches_centralized(
+    curve_params: CurveParameters,
+    threshold_params: ThresholdParameters,
+    batch_size: int = DEFAULT_SHARE_BATCH_SIZE,
+) -> (PublicKey, Iterator[List[KeyShare]]):
+    """
+    Creates a public key and lazily computed batches of the n shares (see create_public_key_and_shares_centralized).
+    Just the current batch is held in memory, which allows creating huge numbers of shares.
+
+    ATTENTION: The secret polynomial is just kept until the iterator is exhausted - shares not consumed are lost.
+
+    :param curve_params: curve parameters to use
+    :param threshold_params: parameters t and n for the threshold scheme
+    :param batch_size: the maximum number of shares per batch
+    :return: (the public key, iterator over batches of the n key shares with ascending x values)
+    """
+    if batch_size <= 0:
+        raise ThresholdCryptoError("Batch size must be greater than 0")
+
     d = number.random_in_range(1, curve_params.order)
-    Q = d * curve_params.P
+    Q = curve_params.mul_base(d)
     pk = PublicKey(Q, curve_params)
 
     # Perform Shamir's secret sharing in Z_q
     polynom = number.PolynomMod.create_random_polynom(
         d, threshold_params.t - 1, curve_params.order
     )
-    supporting_points = range(1, threshold_params.n + 1)
-    shares = [KeyShare(x, polynom.evaluate(x), curve_params) for x in supporting_points]
 
-    return pk, shares
+    def share_batches() -> Iterator[List[KeyShare]]:
+        for start in range(1, threshold_params.n + 1, batch_size):
+            supporting_points = range(
+                start, min(start + batch_size, threshold_params.n + 1)
+            )
+            yield [
+                KeyShare(x, y, curve_params)
+                for x, y in zip(
+                    supporting_points, polynom.evaluate_many(supporting_points)
+                )
+            ]
+
+    return pk, share_batches()
+
+
+def create_public_key_and_write_shares_centralized(
+    curve_params: CurveParameters,
+    threshold_params: ThresholdParameters,
+    sink: Callable[[List[KeyShare]], Any],
+    batch_size: int = DEFAULT_SHARE_BATCH_SIZE,
+) -> PublicKey:
+    """
+    Creates a public key and passes the n shares in batches to a sink, e.g. a function writing them to files,
+    a database table or a socket. Memory usage is independent of n.
+
+    :param curve_params: curve parameters to use
+    :param threshold_params: parameters t and n for the threshold scheme
+    :param sink: called once per batch of shares
+    :param batch_size: the maximum number of shares per batch
+    :return: the public key
+    """
+    pk, share_batches = create_public_key_and_share_batches_centralized(
+        curve_params, threshold_params, batch_size
+    )
+
+    for batch in share_batches:
+        sink(batch)
+
+    return pk
 
 
 def _restore_priv_key(
@@ -68,18 +156,10 @@ def _restore_priv_key(
     x_shares = [share.x for share in used_shares]
     y_shares = [share.y for share in used_shares]
 
-    lagrange_coefficients = [
-        lagrange_coefficient_for_key_share_indices(x_shares, idx, curve_params)
-        for idx in x_shares
-    ]
+    coefficients = _lagrange_coefficient_values(x_shares, curve_params.order)
 
     restored_secret = (
-        sum(
-            [
-                (lagrange_coefficients[i].coefficient * y_shares[i])
-                for i in range(0, len(used_shares))
-            ]
-        )
+        sum([(coefficients[i] * y_shares[i]) for i in range(0, len(used_shares))])
         % curve_params.order
     )
 
@@ -88,63 +168,581 @@ def _restore_priv_key(
 
 # encryption
 
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024
 
-def encrypt_message(message: str, public_key: PublicKey) -> EncryptedMessage:
+_STREAM_FRAME_LENGTH_SIZE = 4
+# the encrypted chunk including its authentication tag has to fit the frame length
+_MAX_STREAM_CHUNK_SIZE = (
+    (1 << 8 * _STREAM_FRAME_LENGTH_SIZE)
+    - 1
+    - nacl.bindings.crypto_secretstream_xchacha20poly1305_ABYTES
+)
+
+
+def encrypt_message(
+    message: str, public_key: PublicKey, key_epoch: Optional[int] = None
+) -> EncryptedMessage:
     """
     Encrypt a message using a public key. A hybrid encryption approach is used to include advantages of symmetric
     encryption (fast, independent of message-length, integrity-preserving by using AE-scheme).
     Internally a combination of Salsa20 and Poly1305 from the cryptographic library NaCl is used.
 
+    Use PublicKey.prepare to speed up encrypting many messages under the same key or an EncryptionPool to precompute
+    the message independent parts of the encryption.
+
     :param message: the message to be encrypted
     :param public_key: the public key
+    :param key_epoch: the optional key epoch of the public key to tag the message with, see KeyEpochRegistry
     :return: the encrypted message
     """
-    curve_params = public_key.curve_params
-    encoded_message = bytes(message, "utf-8")
+    return encrypt_bytes(bytes(message, "utf-8"), public_key, key_epoch)
+
+
+def encrypt_bytes(
+    data: Any, public_key: PublicKey, key_epoch: Optional[int] = None
+) -> EncryptedMessage:
+    """
+    Encrypt binary data using a public key, see encrypt_message. Unlike encrypt_message the data is not encoded first
+    and buffers are passed to the symmetric encryption as they are. Note that the bindings of PyNaCl still copy the
+    data internally (zero padding and output buffer). Use decrypt_bytes for the decryption.
+
+    :param data: the data as object supporting the buffer protocol (bytes, bytearray, memoryview, mmap, ...)
+    :param public_key: the public key
+    :param key_epoch: the optional key epoch of the public key to tag the message with, see KeyEpochRegistry
+    :return: the encrypted message
+    """
+    key_point = _random_key_point(public_key.curve_params)
+    encrypted = _symmetric_encrypt(data, key_point)
+
+    # Use threshold scheme to encrypt the curve point used as hash input to derive the symmetric key
+    C1, C2 = _encrypt_key_point(key_point, public_key)
+
+    return EncryptedMessage(C1, C2, encrypted, key_epoch)
+
+
+def encrypt_message_for_recipients(
+    message: str, public_keys: List[PublicKey]
+) -> MultiRecipientEncryptedMessage:
+    """
+    Encrypt a message for multiple public keys on the same curve, see encrypt_message. The message is symmetrically
+    encrypted only once and just the key point is encrypted for each public key, so the costs grow with the message
+    length plus the number of recipients instead of their product.
+
+    :param message: the message to be encrypted
+    :param public_keys: the public keys of the recipients
+    :return: the encrypted message, use MultiRecipientEncryptedMessage.for_recipient to select a recipient
+    """
+    return encrypt_bytes_for_recipients(bytes(message, "utf-8"), public_keys)
+
+
+def encrypt_bytes_for_recipients(
+    data: Any, public_keys: List[PublicKey]
+) -> MultiRecipientEncryptedMessage:
+    """
+    Encrypt binary data for multiple public keys on the same curve, see encrypt_message_for_recipients and
+    encrypt_bytes.
+
+    :param data: the data as object supporting the buffer protocol (bytes, bytearray, memoryview, mmap, ...)
+    :param public_keys: the public keys of the recipients
+    :return: the encrypted message, use MultiRecipientEncryptedMessage.for_recipient to select a recipient
+    """
+    if len(public_keys) == 0:
+        raise ThresholdCryptoError("At least one public key is required")
+
+    curve_params = public_keys[0].curve_params
+    for public_key in public_keys:
+        if public_key.curve_params != curve_params:
+            raise ThresholdCryptoError("Varying curve parameters found in public keys")
+
+    key_point = _random_key_point(curve_params)
+    encrypted = _symmetric_encrypt(data, key_point)
+
+    C1s = []
+    C2s = []
+    for public_key in public_keys:
+        C1, C2 = _encrypt_key_point(key_point, public_key)
+        C1s.append(C1)
+        C2s.append(C2)
+
+    return MultiRecipientEncryptedMessage(
+        [public_key.Q for public_key in public_keys], C1s, C2s, encrypted
+    )
+
+
+def encapsulate(public_key: PublicKey) -> (ECC.EccPoint, ECC.EccPoint, bytes):
+    """
+    Create a random data encryption key (DEK) encapsulated for a public key. The DEK is derived from a random key point
+    like the symmetric key in encrypt_message, but instead of encrypting a single message it is returned. Only the
+    threshold encrypted key point (C1, C2) has to be stored, so a single threshold decryption recovers a DEK which
+    can encrypt any number of records, e.g. using nacl.secret.SecretBox with random nonces.
+
+    The share owners compute their partial decryptions for EncryptedMessage(C1, C2, b"") using
+    compute_partial_decryption. This also allows to serialize and re-encrypt the encapsulated key.
+
+    :param public_key: the public key
+    :return: C1, C2 and the 32 byte DEK
+    """
+    key_point = _random_key_point(public_key.curve_params)
+    C1, C2 = _encrypt_key_point(key_point, public_key)
+
+    return C1, C2, _symmetric_key(key_point)
+
+
+def encrypt_stream(
+    source: Any,
+    sink: Any,
+    public_key: PublicKey,
+    chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+    key_epoch: Optional[int] = None,
+) -> EncryptedMessage:
+    """
+    Encrypt a large payload in chunks using a public key. The payload is encrypted with libsodium's secretstream
+    (XChaCha20-Poly1305) under a key derived from a threshold encrypted key point like in encrypt_message. Only one
+    chunk is held in memory at a time, so the memory usage does not depend on the payload size.
+
+    The encrypted chunks are written to the sink, each prefixed by its 4 byte big-endian length. The returned
+    EncryptedMessage holds the encrypted key point and the secretstream header in place of the ciphertext. It is used
+    for partial decryptions and re-encryption like any other encrypted message, the written chunks remain unchanged.
+
+    :param source: the payload as bytes-like object, readable binary file object or iterable of bytes-like objects
+    :param sink: a writable binary file object receiving the encrypted chunks
+    :param public_key: the public key
+    :param chunk_size: the maximum number of plaintext bytes per chunk
+    :param key_epoch: the optional key epoch of the public key to tag the message with, see KeyEpochRegistry
+    :return: the encrypted message required to decrypt the stream with decrypt_stream
+    """
+    if not 0 < chunk_size <= _MAX_STREAM_CHUNK_SIZE:
+        raise ThresholdCryptoError(
+            "Chunk size must be in range [1, {}]".format(_MAX_STREAM_CHUNK_SIZE)
+        )
+
+    key_point = _random_key_point(public_key.curve_params)
+    state = nacl.bindings.crypto_secretstream_xchacha20poly1305_state()
+    header = nacl.bindings.crypto_secretstream_xchacha20poly1305_init_push(
+        state, _symmetric_key(key_point)
+    )
+
+    # one chunk is read ahead to mark the last one as final, which detects truncated streams
+    chunks = _stream_chunks(source, chunk_size)
+    chunk = next(chunks, b"")
+    for next_chunk in chunks:
+        _write_stream_frame(
+            sink, nacl.bindings.crypto_secretstream_xchacha20poly1305_push(state, chunk)
+        )
+        chunk = next_chunk
+
+    _write_stream_frame(
+        sink,
+        nacl.bindings.crypto_secretstream_xchacha20poly1305_push(
+            state,
+            chunk,
+            tag=nacl.bindings.crypto_secretstream_xchacha20poly1305_TAG_FINAL,
+        ),
+    )
+
+    C1, C2 = _encrypt_key_point(key_point, public_key)
+
+    return EncryptedMessage(C1, C2, header, key_epoch)
+
+
+def encrypt_messages(
+    messages: Iterable[str],
+    public_key: PublicKey,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    key_epoch: Optional[int] = None,
+) -> Iterator[EncryptedMessage]:
+    """
+    Encrypt many messages using the same public key, see encrypt_message. The encryptions are distributed in chunks
+    over a pool of worker processes, each using a prepared copy of the public key. Messages are consumed lazily and
+    the encrypted messages are yielded in the order of the given messages.
+
+    :param messages: the messages to be encrypted
+    :param public_key: the public key
+    :param workers: the number of worker processes (defaults to the number of CPUs, 1 encrypts in this process)
+    :param chunk_size: the number of messages sent to a worker at once
+    :param key_epoch: the optional key epoch of the public key to tag the message with, see KeyEpochRegistry
+    :return: the encrypted messages
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        key = public_key
+        if not key.prepared:
+            key = PublicKey(public_key.Q, public_key.curve_params).prepare()
+
+        for message in messages:
+            yield encrypt_message(message, key, key_epoch)
+
+        return
+
+    backend = public_key.curve_params.backend
+    chunks = _chunks(messages, chunk_size)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_encryption_worker,
+        initargs=(public_key.to_json(),),
+    ) as executor:
+        # limit the number of chunks in flight to consume the messages lazily
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_encrypt_message_chunk, chunk))
+
+            if len(pending) >= 2 * workers:
+                yield from _decode_encrypted_chunk(
+                    pending.popleft().result(), backend, key_epoch
+                )
+
+        while pending:
+            yield from _decode_encrypted_chunk(
+                pending.popleft().result(), backend, key_epoch
+            )
+
+
+def _chunks(items: Iterable, chunk_size: int) -> Iterator[list]:
+    iterator = iter(items)
+    chunk = list(itertools.islice(iterator, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, chunk_size))
+
+
+# points can not be pickled, so encrypted messages are passed between processes as coordinates
+_EncodedEncryptedMessage = Tuple[int, int, int, int, bytes]
+
+_worker_public_key: Optional[PublicKey] = None
+
+
+def _init_encryption_worker(public_key_json: str):
+    global _worker_public_key
+    _worker_public_key = PublicKey.from_json(public_key_json).prepare()
+
+
+def _encrypt_message_chunk(messages: List[str]) -> List[_EncodedEncryptedMessage]:
+    ems = [encrypt_message(message, _worker_public_key) for message in messages]
+    coordinates = group.affine_coordinates([p for em in ems for p in (em.C1, em.C2)])
+
+    return [
+        (*coordinates[2 * i], *coordinates[2 * i + 1], bytes(em.ciphertext))
+        for i, em in enumerate(ems)
+    ]
+
+
+def _decode_encrypted_chunk(
+    encoded: List[_EncodedEncryptedMessage],
+    backend: group.GroupBackend,
+    key_epoch: Optional[int],
+) -> Iterator[EncryptedMessage]:
+    for C1x, C1y, C2x, C2y, ciphertext in encoded:
+        yield EncryptedMessage(
+            backend.point(C1x, C1y), backend.point(C2x, C2y), ciphertext, key_epoch
+        )
 
+
+def _random_key_point(curve_params: CurveParameters) -> ECC.EccPoint:
     # Create random subgroup element and use its hash as symmetric key to prevent
     # attacks described in "Why Textbook ElGamal and RSA Encryption Are Insecure"
     # by Boneh et. al.
     r = number.random_in_range(1, curve_params.order)
-    key_point = r * curve_params.P
-    point_bytes = _key_bytes_from_point(key_point)
+    return curve_params.mul_base(r)
 
-    try:
-        symmetric_key = nacl.hash.blake2b(
-            point_bytes,
+
+def _symmetric_key(key_point: ECC.EccPoint) -> bytes:
+    return _symmetric_keys([key_point])[0]
+
+
+def _symmetric_keys(key_points: List[ECC.EccPoint]) -> List[bytes]:
+    # the keys are derived from the x coordinates, which are computed for all points at once
+    return [
+        nacl.hash.blake2b(
+            _key_bytes_from_x(x),
             digest_size=nacl.secret.SecretBox.KEY_SIZE,
             encoder=nacl.encoding.RawEncoder,
         )
-        # Use derived symmetric key to encrypt the message
-        box = nacl.secret.SecretBox(symmetric_key)
-        encrypted = box.encrypt(encoded_message)
+        for x, _ in group.affine_coordinates(key_points)
+    ]
+
+
+def _symmetric_encrypt(data: Any, key_point: ECC.EccPoint) -> bytes:
+    # The result is nonce + ciphertext like SecretBox.encrypt creates it. The bindings of PyNaCl accept any byte
+    # buffer, but copy it into a zero padded buffer and prepending the nonce copies the ciphertext once more.
+    message = memoryview(data).cast("B")
+    nonce = nacl.utils.random(nacl.secret.SecretBox.NONCE_SIZE)
+
+    # Use derived symmetric key to encrypt the message
+    try:
+        encrypted = nacl.bindings.crypto_secretbox(
+            message, nonce, _symmetric_key(key_point)
+        )
     except nacl.exceptions.CryptoError as e:
         print("Encryption failed: " + str(e))
         raise ThresholdCryptoError("Message encryption failed.")
 
-    # Use threshold scheme to encrypt the curve point used as hash input to derive the symmetric key
-    C1, C2 = _encrypt_key_point(key_point, public_key.Q, curve_params)
+    return nonce + encrypted
+
+
+def _symmetric_decrypt(ciphertext: Any, symmetric_key: bytes) -> bytes:
+    # split nonce + ciphertext without copying the ciphertext, see _symmetric_encrypt
+    view = memoryview(ciphertext).cast("B")
+    nonce_size = nacl.secret.SecretBox.NONCE_SIZE
 
-    return EncryptedMessage(C1, C2, encrypted)
+    try:
+        return nacl.bindings.crypto_secretbox_open(
+            view[nonce_size:], bytes(view[:nonce_size]), symmetric_key
+        )
+    except nacl.exceptions.CryptoError as e:
+        raise ThresholdCryptoError("Message decryption failed. Internal: " + str(e))
 
 
 def _key_bytes_from_point(p: ECC.EccPoint) -> bytes:
-    key_point_byte_length = (int(p.x).bit_length() + 7) // 8
-    point_bytes = int(p.x).to_bytes(key_point_byte_length, byteorder="big")
+    return _key_bytes_from_x(group.affine_coordinates([p])[0][0])
+
+
+def _key_bytes_from_x(x: int) -> bytes:
+    key_point_byte_length = (x.bit_length() + 7) // 8
+    point_bytes = x.to_bytes(key_point_byte_length, byteorder="big")
     return point_bytes
 
 
+def _random_ephemeral_points(public_key: PublicKey) -> (ECC.EccPoint, ECC.EccPoint):
+    curve_params = public_key.curve_params
+    k = number.random_in_range(1, curve_params.order)
+
+    return curve_params.mul_base(k), public_key.mul_Q(k)
+
+
 def _encrypt_key_point(
-    key_point: ECC.EccPoint, Q: ECC.EccPoint, curve_params: CurveParameters
+    key_point: ECC.EccPoint, public_key: PublicKey
 ) -> (ECC.EccPoint, ECC.EccPoint):
-    k = number.random_in_range(1, curve_params.order)
-    C1 = k * curve_params.P
-    kQ = k * Q
-    C2 = key_point + kQ
+    C1, C2 = _random_ephemeral_points(public_key)
+    # kQ is a fresh point, so the addition can be done in place
+    C2 += key_point
 
     return C1, C2
 
 
+def _stream_chunks(source: Any, chunk_size: int) -> Iterator[bytes]:
+    if hasattr(source, "read"):
+        chunk = source.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = source.read(chunk_size)
+        return
+
+    try:
+        view = memoryview(source).cast("B")
+    except TypeError:
+        view = None
+
+    if view is not None:
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start : start + chunk_size])
+        return
+
+    # pieces of an iterable are joined or split into chunks of the given size
+    buffer = bytearray()
+    for piece in source:
+        buffer += piece
+        if len(buffer) >= chunk_size:
+            view = memoryview(buffer)
+            end = len(buffer) - len(buffer) % chunk_size
+            for start in range(0, end, chunk_size):
+                yield bytes(view[start : start + chunk_size])
+            view.release()
+            del buffer[:end]
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def _write_stream_frame(sink: Any, data: bytes):
+    sink.write(len(data).to_bytes(_STREAM_FRAME_LENGTH_SIZE, byteorder="big"))
+    sink.write(data)
+
+
+def _read_stream_frame(source: Any) -> Optional[bytes]:
+    length_bytes = source.read(_STREAM_FRAME_LENGTH_SIZE)
+    if not length_bytes:
+        return None
+
+    length = int.from_bytes(length_bytes, byteorder="big")
+    data = source.read(length)
+    if len(length_bytes) != _STREAM_FRAME_LENGTH_SIZE or len(data) != length:
+        raise ThresholdCryptoError("Truncated encrypted stream")
+
+    return data
+
+
+class EncryptionPool:
+    """
+    A pool of precomputed, message independent encryption values (rP, kP, kQ) for one public key.
+
+    A background thread keeps the pool filled, so that the expensive scalar multiplications can be performed during
+    idle times. Encrypting a message with the pool then only requires one point addition, a hash and the symmetric
+    encryption. Every precomputed triple is removed from the pool when it is taken and thus used exactly once.
+    If the pool runs empty, the values are computed inline as in encrypt_message.
+    """
+
+    DEFAULT_SIZE = 1024
+
+    def __init__(
+        self,
+        public_key: PublicKey,
+        size: int = DEFAULT_SIZE,
+        refill_threshold: Optional[int] = None,
+        start: bool = True,
+    ):
+        """
+        Create the pool for a public key.
+
+        :param public_key: the public key used for all encryptions (consider preparing it, see PublicKey.prepare)
+        :param size: the maximum number of precomputed triples
+        :param refill_threshold: the background thread starts refilling when at most this many triples are left
+        (defaults to half of the size)
+        :param start: whether to start the background thread right away
+        """
+        if size <= 0:
+            raise ThresholdCryptoError("Pool size must be greater than 0")
+
+        if refill_threshold is None:
+            refill_threshold = size // 2
+
+        if not 0 <= refill_threshold < size:
+            raise ThresholdCryptoError(
+                "Refill threshold {} not in range [0, {})".format(
+                    refill_threshold, size
+                )
+            )
+
+        self.public_key = public_key
+        self.size = size
+        self.refill_threshold = refill_threshold
+        self.inline_computations = 0
+
+        self._triples: queue.Queue = queue.Queue(maxsize=size)
+        self._refill = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if start:
+            self.start()
+
+    def __enter__(self) -> "EncryptionPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __len__(self) -> int:
+        return self._triples.qsize()
+
+    def start(self):
+        """Start the background thread filling the pool."""
+        if self._thread is not None:
+            raise ThresholdCryptoError("Encryption pool already started")
+
+        self._stop.clear()
+        self._refill.set()
+        self._thread = threading.Thread(
+            target=self._run, name="EncryptionPool", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and discard all precomputed values."""
+        if self._thread is not None:
+            self._stop.set()
+            self._refill.set()
+            self._thread.join()
+            self._thread = None
+
+        while not self._triples.empty():
+            self._triples.get_nowait()
+
+    def fill(self, count: Optional[int] = None):
+        """
+        Synchronously add precomputed triples to the pool, e.g. to warm it up before a burst.
+
+        :param count: the number of triples to add (defaults to filling the pool completely)
+        """
+        if count is None:
+            count = self.size
+
+        for _ in range(0, count):
+            if not self._put_triple():
+                break
+
+    def encrypt_message(
+        self, message: str, key_epoch: Optional[int] = None
+    ) -> EncryptedMessage:
+        """
+        Encrypt a message using the public key of this pool, see encrypt_message.
+
+        :param message: the message to be encrypted
+        :param key_epoch: the optional key epoch of the public key to tag the message with
+        :return: the encrypted message
+        """
+        return self.encrypt_bytes(bytes(message, "utf-8"), key_epoch)
+
+    def encrypt_bytes(
+        self, data: Any, key_epoch: Optional[int] = None
+    ) -> EncryptedMessage:
+        """
+        Encrypt binary data using the public key of this pool, see encrypt_bytes.
+
+        :param data: the data as object supporting the buffer protocol
+        :param key_epoch: the optional key epoch of the public key to tag the message with
+        :return: the encrypted message
+        """
+        key_point, C1, C2 = self._take_triple()
+
+        encrypted = _symmetric_encrypt(data, key_point)
+        C2 += key_point
+
+        return EncryptedMessage(C1, C2, encrypted, key_epoch)
+
+    def _take_triple(self) -> (ECC.EccPoint, ECC.EccPoint, ECC.EccPoint):
+        try:
+            triple = self._triples.get_nowait()
+        except queue.Empty:
+            triple = None
+
+        if self._triples.qsize() <= self.refill_threshold:
+            self._refill.set()
+
+        if triple is None:
+            self.inline_computations += 1
+            triple = self._compute_triple()
+
+        return triple
+
+    def _compute_triple(self) -> (ECC.EccPoint, ECC.EccPoint, ECC.EccPoint):
+        key_point = _random_key_point(self.public_key.curve_params)
+        C1, kQ = _random_ephemeral_points(self.public_key)
+
+        return key_point, C1, kQ
+
+    def _put_triple(self) -> bool:
+        if self._triples.full():
+            return False
+
+        try:
+            self._triples.put_nowait(self._compute_triple())
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._refill.wait()
+            self._refill.clear()
+
+            while not self._stop.is_set() and self._put_triple():
+                pass
+
+
 # decryption
 
 
@@ -157,6 +755,10 @@ def decrypt_message(
     Decrypt a message using the combination of at least t partial decryptions. Similar to the encryption process
     the hybrid approach is used for decryption.
 
+    A MultiRecipientEncryptedMessage is decrypted by trying the encrypted key points of all recipients, which costs
+    a point addition and an authentication of the ciphertext per recipient. Pass the EncryptedMessage selected by
+    MultiRecipientEncryptedMessage.for_recipient instead if the recipient is known.
+
     :param partial_decryptions: at least t partial decryptions
     :param encrypted_message: the encrapted message to be decrypted
     :param threshold_params: the used threshold parameters
@@ -168,37 +770,304 @@ def decrypt_message(
     return _decrypt_message(partial_decryptions, encrypted_message)
 
 
+def decrypt_bytes(
+    partial_decryptions: List[PartialDecryption],
+    encrypted_message: EncryptedMessage,
+    threshold_params: ThresholdParameters,
+) -> bytes:
+    """
+    Decrypt binary data encrypted by encrypt_bytes using the combination of at least t partial decryptions, see
+    decrypt_message. The plaintext is returned as bytes without decoding it, the ciphertext is passed to the symmetric
+    decryption without copying it (the bindings of PyNaCl still copy it internally).
+
+    :param partial_decryptions: at least t partial decryptions
+    :param encrypted_message: the encrypted message to be decrypted (a MultiRecipientEncryptedMessage is possible,
+        see decrypt_message)
+    :param threshold_params: the used threshold parameters
+    :return: the decrypted data
+    """
+    if len(partial_decryptions) < threshold_params.t:
+        raise ThresholdCryptoError("less than t partial decryptions given")
+
+    return _decrypt_bytes(partial_decryptions, encrypted_message)
+
+
+def decapsulate(
+    partial_decryptions: List[PartialDecryption],
+    C1: ECC.EccPoint,
+    C2: ECC.EccPoint,
+    threshold_params: ThresholdParameters,
+) -> bytes:
+    """
+    Recover a data encryption key created by encapsulate using the combination of at least t partial decryptions.
+    The DEK has no integrity protection of its own, invalid partial decryptions result in a wrong DEK which is only
+    detected by the symmetric decryption of the records.
+
+    :param partial_decryptions: at least t partial decryptions of EncryptedMessage(C1, C2, b"")
+    :param C1: the first point returned by encapsulate
+    :param C2: the second point returned by encapsulate
+    :param threshold_params: the used threshold parameters
+    :return: the 32 byte DEK
+    """
+    if len(partial_decryptions) < threshold_params.t:
+        raise ThresholdCryptoError("less than t partial decryptions given")
+
+    key_point = _restore_key_point(partial_decryptions, EncryptedMessage(C1, C2, b""))
+
+    return _symmetric_key(key_point)
+
+
 def _decrypt_message(
     partial_decryptions: List[PartialDecryption],
     encrypted_message: EncryptedMessage,
 ) -> str:
     # this method does not contain the check for given number of partial decryptions to allow testing the failing decryption
-    curve_params = partial_decryptions[0].curve_params
-    for partial_key in partial_decryptions:
-        if partial_key.curve_params != curve_params:
-            raise ThresholdCryptoError(
-                "Varying curve parameters found in partial re-encryption keys"
+    return str(_decrypt_bytes(partial_decryptions, encrypted_message), "utf-8")
+
+
+def _decrypt_bytes(
+    partial_decryptions: List[PartialDecryption],
+    encrypted_message: EncryptedMessage,
+) -> bytes:
+    if isinstance(encrypted_message, MultiRecipientEncryptedMessage):
+        return _decrypt_multi_recipient_bytes(partial_decryptions, encrypted_message)
+
+    key_point = _restore_key_point(partial_decryptions, encrypted_message)
+
+    return _symmetric_decrypt(encrypted_message.ciphertext, _symmetric_key(key_point))
+
+
+def _decrypt_multi_recipient_bytes(
+    partial_decryptions: List[PartialDecryption],
+    encrypted_message: MultiRecipientEncryptedMessage,
+) -> bytes:
+    # the partial decryptions belong to one of the recipients, the combination is shared by the attempts
+    curve_params = _partial_decryptions_curve_params(partial_decryptions)
+    try:
+        combined = _combine_partial_decryptions(partial_decryptions, curve_params)
+        group.decode_lazy_points(encrypted_message.C2s)
+    except ValueError as e:
+        raise ThresholdCryptoError("Invalid point: {}".format(e))
+
+    for C2 in encrypted_message.C2s:
+        key_point = number.ecc_copy(combined)
+        key_point += C2
+        try:
+            return _symmetric_decrypt(
+                encrypted_message.ciphertext, _symmetric_key(key_point)
             )
+        except ThresholdCryptoError:
+            pass
 
-    key_point = _combine_shares(
-        partial_decryptions,
-        encrypted_message,
-        curve_params,
+    raise ThresholdCryptoError(
+        "Message decryption failed for all {} recipients".format(
+            len(encrypted_message.C2s)
+        )
     )
-    point_bytes = _key_bytes_from_point(key_point)
 
-    try:
-        key = nacl.hash.blake2b(
-            point_bytes,
-            digest_size=nacl.secret.SecretBox.KEY_SIZE,
-            encoder=nacl.encoding.RawEncoder,
+
+def decrypt_messages(
+    partials_by_message: List[List[PartialDecryption]],
+    encrypted_messages: List[EncryptedMessage],
+    threshold_params: ThresholdParameters,
+    workers: Optional[int] = None,
+) -> List[Union[str, ThresholdCryptoError]]:
+    """
+    Decrypt many messages, see decrypt_message. This is made for batches answered by the same share owners: the
+    Lagrange coefficients are computed once per set of share indices, each message is combined using a multi-scalar
+    multiplication and the key points are converted to affine coordinates at once. The symmetric decryptions run in
+    a pool of worker threads, libsodium releases the GIL while decrypting.
+
+    A message which can not be decrypted does not abort the batch, the ThresholdCryptoError describing the failure
+    is returned in place of the message instead.
+
+    The PartialDecryptionBatch objects of the share owners are converted to partials_by_message by
+    list(zip(*batches)).
+
+    :param partials_by_message: at least t partial decryptions for each encrypted message
+    :param encrypted_messages: the encrypted messages to be decrypted
+    :param threshold_params: the used threshold parameters
+    :param workers: the number of worker threads (defaults to the number of CPUs, 1 decrypts in this thread)
+    :return: the decrypted messages or errors in the order of the encrypted messages
+    """
+    if len(partials_by_message) != len(encrypted_messages):
+        raise ThresholdCryptoError(
+            "Number of partial decryption lists {} != {} = number of encrypted messages".format(
+                len(partials_by_message), len(encrypted_messages)
+            )
         )
-        box = nacl.secret.SecretBox(key)
-        encoded_plaintext = box.decrypt(encrypted_message.ciphertext)
-    except nacl.exceptions.CryptoError as e:
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    results: List[Union[str, ThresholdCryptoError, None]] = [None] * len(
+        encrypted_messages
+    )
+    combined_indices = []
+    key_points = []
+    negated_coefficients: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+
+    for i, (partial_decryptions, em) in enumerate(
+        zip(partials_by_message, encrypted_messages)
+    ):
+        try:
+            if len(partial_decryptions) < threshold_params.t:
+                raise ThresholdCryptoError("less than t partial decryptions given")
+
+            if isinstance(em, MultiRecipientEncryptedMessage):
+                results[i] = _decoded_plaintext(_decrypt_bytes(partial_decryptions, em))
+                continue
+
+            curve_params = _partial_decryptions_curve_params(partial_decryptions)
+            q = curve_params.order
+            share_indices = tuple(dec.x for dec in partial_decryptions)
+
+            coefficients = negated_coefficients.get((q, share_indices))
+            if coefficients is None:
+                coefficients = [
+                    (-coefficient) % q
+                    for coefficient in _lagrange_coefficient_values(
+                        list(share_indices), q
+                    )
+                ]
+                negated_coefficients[(q, share_indices)] = coefficients
+
+            key_point = number.multi_scalar_mul(
+                coefficients, [dec.yC1 for dec in partial_decryptions]
+            )
+            key_point += em.C2
+        except ThresholdCryptoError as e:
+            results[i] = e
+            continue
+        except ValueError as e:
+            # invalid points of lazily decoded partial decryptions
+            results[i] = ThresholdCryptoError(
+                "Message decryption failed. Internal: " + str(e)
+            )
+            continue
+
+        combined_indices.append(i)
+        key_points.append(key_point)
+
+    ciphertexts = [encrypted_messages[i].ciphertext for i in combined_indices]
+    symmetric_keys = _symmetric_keys(key_points)
+
+    if workers <= 1:
+        plaintexts = map(_decrypt_batch_message, ciphertexts, symmetric_keys)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            plaintexts = list(
+                executor.map(_decrypt_batch_message, ciphertexts, symmetric_keys)
+            )
+
+    for i, plaintext in zip(combined_indices, plaintexts):
+        results[i] = plaintext
+
+    return results
+
+
+def _decrypt_batch_message(
+    ciphertext: bytes, symmetric_key: bytes
+) -> Union[str, ThresholdCryptoError]:
+    try:
+        return _decoded_plaintext(_symmetric_decrypt(ciphertext, symmetric_key))
+    except ThresholdCryptoError as e:
+        return e
+
+
+def _decoded_plaintext(encoded_plaintext: bytes) -> str:
+    try:
+        return str(encoded_plaintext, "utf-8")
+    except UnicodeDecodeError as e:
         raise ThresholdCryptoError("Message decryption failed. Internal: " + str(e))
 
-    return str(encoded_plaintext, "utf-8")
+
+def decrypt_stream(
+    partial_decryptions: List[PartialDecryption],
+    encrypted_message: EncryptedMessage,
+    source: Any,
+    sink: Any,
+    threshold_params: ThresholdParameters,
+) -> int:
+    """
+    Decrypt a payload encrypted by encrypt_stream using the combination of at least t partial decryptions of the
+    returned encrypted message. The chunks are decrypted and written one at a time, so the memory usage does not
+    depend on the payload size.
+
+    Each chunk is authenticated before it is written, but a truncated or manipulated stream is only detected when the
+    affected chunk is reached. The sink may contain the preceding plaintext if a ThresholdCryptoError is raised.
+
+    :param partial_decryptions: at least t partial decryptions
+    :param encrypted_message: the encrypted message returned by encrypt_stream
+    :param source: the encrypted chunks as readable binary file object or bytes-like object
+    :param sink: a writable binary file object receiving the plaintext
+    :param threshold_params: the used threshold parameters
+    :return: the number of plaintext bytes written
+    """
+    if len(partial_decryptions) < threshold_params.t:
+        raise ThresholdCryptoError("less than t partial decryptions given")
+
+    header = bytes(encrypted_message.ciphertext)
+    if len(header) != nacl.bindings.crypto_secretstream_xchacha20poly1305_HEADERBYTES:
+        raise ThresholdCryptoError("Encrypted message holds no stream header")
+
+    key_point = _restore_key_point(partial_decryptions, encrypted_message)
+    state = nacl.bindings.crypto_secretstream_xchacha20poly1305_state()
+    nacl.bindings.crypto_secretstream_xchacha20poly1305_init_pull(
+        state, header, _symmetric_key(key_point)
+    )
+
+    if not hasattr(source, "read"):
+        source = io.BytesIO(source)
+
+    written = 0
+    tag = None
+    frame = _read_stream_frame(source)
+    while frame is not None:
+        if tag == nacl.bindings.crypto_secretstream_xchacha20poly1305_TAG_FINAL:
+            raise ThresholdCryptoError("Data found after the final stream chunk")
+
+        try:
+            chunk, tag = nacl.bindings.crypto_secretstream_xchacha20poly1305_pull(
+                state, frame
+            )
+        except nacl.exceptions.CryptoError as e:
+            raise ThresholdCryptoError("Stream decryption failed. Internal: " + str(e))
+
+        sink.write(chunk)
+        written += len(chunk)
+        frame = _read_stream_frame(source)
+
+    if tag != nacl.bindings.crypto_secretstream_xchacha20poly1305_TAG_FINAL:
+        raise ThresholdCryptoError("Truncated encrypted stream")
+
+    return written
+
+
+def _restore_key_point(
+    partial_decryptions: List[PartialDecryption],
+    encrypted_message: EncryptedMessage,
+) -> ECC.EccPoint:
+    curve_params = _partial_decryptions_curve_params(partial_decryptions)
+
+    try:
+        return _combine_shares(partial_decryptions, encrypted_message, curve_params)
+    except ValueError as e:
+        # invalid points of lazily decoded messages or partial decryptions
+        raise ThresholdCryptoError("Invalid point: {}".format(e))
+
+
+def _partial_decryptions_curve_params(
+    partial_decryptions: List[PartialDecryption],
+) -> CurveParameters:
+    curve_params = partial_decryptions[0].curve_params
+    for partial_key in partial_decryptions:
+        if partial_key.curve_params != curve_params:
+            raise ThresholdCryptoError(
+                "Varying curve parameters found in partial re-encryption keys"
+            )
+
+    return curve_params
 
 
 def _combine_shares(
@@ -206,22 +1075,25 @@ def _combine_shares(
     encrypted_message: EncryptedMessage,
     curve_params: CurveParameters,
 ) -> ECC.EccPoint:
-    # compute lagrange coefficients
-    partial_indices = [dec.x for dec in partial_decryptions]
-    lagrange_coefficients = [
-        lagrange_coefficient_for_key_share_indices(partial_indices, idx, curve_params)
-        for idx in partial_indices
-    ]
+    restored_point = _combine_partial_decryptions(partial_decryptions, curve_params)
+    restored_point += encrypted_message.C2
 
-    summands = [
-        lagrange_coefficients[i].coefficient * partial_decryptions[i].yC1
-        for i in range(0, len(partial_decryptions))
-    ]
-    restored_kdP = number.ecc_sum(summands)
+    return restored_point
 
-    restored_point = encrypted_message.C2 + (-restored_kdP)
 
-    return restored_point
+def _combine_partial_decryptions(
+    partial_decryptions: List[PartialDecryption],
+    curve_params: CurveParameters,
+) -> ECC.EccPoint:
+    # compute lagrange coefficients
+    partial_indices = [dec.x for dec in partial_decryptions]
+    coefficients = _lagrange_coefficient_values(partial_indices, curve_params.order)
+
+    # -sum(λ_i * yC1_i) computed as sum((q - λ_i) * yC1_i) to save the point negation, C2 is added by the caller
+    return number.multi_scalar_mul(
+        [(-coefficient) % curve_params.order for coefficient in coefficients],
+        [dec.yC1 for dec in partial_decryptions],
+    )
 
 
 # re-encryption
@@ -245,20 +1117,71 @@ def lagrange_coefficient_for_key_share_indices(
             )
         )
 
-    idx_len = len(key_share_indices)
     i = key_share_indices.index(p_idx)
+    coefficient = _lagrange_coefficient_values(key_share_indices, curve_params.order)[i]
 
-    def x(idx):
-        return key_share_indices[idx]
+    return LagrangeCoefficient(p_idx, key_share_indices, coefficient)
+
+
+def lagrange_coefficients(
+    key_share_indices: List[int], curve_params: CurveParameters
+) -> List[LagrangeCoefficient]:
+    """
+    Create the Lagrange coefficients for all participants of a list of key shares at once.
+    Coefficients are cached for recently used sets of indices.
 
-    tmp = [
-        (-x(j) * number.prime_mod_inv(x(i) - x(j), curve_params.order))
-        for j in range(0, idx_len)
-        if not j == i
+    :param key_share_indices: the used indices for the participants key shares
+    :param curve_params: the used curve parameters
+    :return: the Lagrange coefficients in the order of the indices
+    """
+    coefficients = _lagrange_coefficient_values(key_share_indices, curve_params.order)
+    used_index_values = frozenset(key_share_indices)
+
+    return [
+        LagrangeCoefficient(p_idx, used_index_values, coefficient)
+        for p_idx, coefficient in zip(key_share_indices, coefficients)
     ]
-    coefficient = number.prod(tmp) % curve_params.order  # lambda_i
 
-    return LagrangeCoefficient(p_idx, key_share_indices, coefficient)
+
+def _lagrange_coefficient_values(key_share_indices: List[int], q: int) -> List[int]:
+    # indices equal modulo q would need the inverse of 0
+    if len({p_idx % q for p_idx in key_share_indices}) != len(key_share_indices):
+        raise ThresholdCryptoError(
+            "Duplicate indices in {} for computation of Lagrange coefficients".format(
+                key_share_indices
+            )
+        )
+
+    coefficients = _cached_lagrange_coefficients(frozenset(key_share_indices), q)
+
+    return [coefficients[p_idx] for p_idx in key_share_indices]
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_lagrange_coefficients(
+    key_share_indices: frozenset, q: int
+) -> Dict[int, int]:
+    # lambda_i = prod_{j != i} (-x_j) / (x_i - x_j)
+    x = list(key_share_indices)
+    idx_len = len(x)
+
+    # the numerators prod_{j != i} (-x_j) as products of prefix and suffix products
+    prefix_products = [1]
+    for j in range(0, idx_len):
+        prefix_products.append(prefix_products[-1] * -x[j] % q)
+    suffix_product = 1
+    numerators = [0] * idx_len
+    for i in reversed(range(0, idx_len)):
+        numerators[i] = prefix_products[i] * suffix_product % q
+        suffix_product = suffix_product * -x[i] % q
+
+    denominators = [
+        number.prod([x[i] - x[j] for j in range(0, idx_len) if j != i]) % q
+        for i in range(0, idx_len)
+    ]
+    inverses = number.batch_mod_inv(denominators, q)
+
+    return {x[i]: numerators[i] * inverses[i] % q for i in range(0, idx_len)}
 
 
 def combine_partial_re_encryption_keys(
@@ -293,10 +1216,51 @@ def combine_partial_re_encryption_keys(
             )
 
     re_key = sum([k.partial_key for k in partial_keys]) % curve_params.order
+    _check_re_encryption_key(re_key, curve_params, old_public_key, new_public_key)
+
+    return ReEncryptionKey(re_key, curve_params)
+
+
+def compose_re_encryption_keys(
+    re_keys: List[ReEncryptionKey],
+    old_public_key: PublicKey,
+    new_public_key: PublicKey,
+) -> ReEncryptionKey:
+    """
+    Compose the re-encryption keys of consecutive access structure changes A -> B -> ... -> Z into a single
+    re-encryption key A -> Z. The keys are differences of private keys, so the composed key is their sum and
+    re-encrypting a message with it costs a single scalar multiplication instead of one per change.
+
+    :param re_keys: the re-encryption keys in the order of the changes
+    :param old_public_key: the public key of the first access structure A
+    :param new_public_key: the public key of the last access structure Z
+    :return: the composed re-encryption key
+    """
+    if len(re_keys) == 0:
+        raise ThresholdCryptoError("No re-encryption keys given")
+
+    curve_params = re_keys[0].curve_params
+    for re_key in re_keys:
+        if re_key.curve_params != curve_params:
+            raise ThresholdCryptoError(
+                "Varying curve parameters found in re-encryption keys"
+            )
+
+    composed_key = sum(re_key.key for re_key in re_keys) % curve_params.order
+    _check_re_encryption_key(composed_key, curve_params, old_public_key, new_public_key)
+
+    return ReEncryptionKey(composed_key, curve_params)
 
+
+def _check_re_encryption_key(
+    re_key: int,
+    curve_params: CurveParameters,
+    old_public_key: PublicKey,
+    new_public_key: PublicKey,
+):
     # check that the proxy key is valid using the given public keys
     # proxy_key * P =?= new_pub - old_pub
-    checkval1 = curve_params.P * re_key
+    checkval1 = curve_params.mul_base(re_key)
     checkval2 = new_public_key.Q + (-old_public_key.Q)
 
     if checkval1 != checkval2:
@@ -304,19 +1268,466 @@ def combine_partial_re_encryption_keys(
             "The combined proxy key is invalid for given public keys."
         )
 
-    return ReEncryptionKey(re_key, curve_params)
-
 
 def re_encrypt_message(
-    em: EncryptedMessage, re_key: ReEncryptionKey
+    em: EncryptedMessage,
+    re_key: ReEncryptionKey,
+    key_epochs: Optional[Tuple[int, int]] = None,
 ) -> EncryptedMessage:
     """
     Re-encrypts a message using the provided re-encryption key.
 
+    Messages tagged with a key epoch (see KeyEpochRegistry) require the key epochs of the re-encryption key. A message
+    of the source epoch is re-encrypted and tagged with the target epoch, a message of the target epoch is already
+    re-encrypted and returned unchanged and messages of other epochs are refused. Untagged messages are taken to be
+    of the source epoch.
+
     :param em: the message
     :param re_key: the re-encryption key
+    :param key_epochs: the key epochs (from_epoch, to_epoch) the re-encryption key was created for
     :return:
     """
-    re_enc_c = em.C2 + em.C1 * re_key.key
+    if not _re_encryption_required(em, key_epochs):
+        return em
+
+    try:
+        C2 = _re_encrypted_C2(em.C1, em.C2, re_key.key)
+    except ValueError as e:
+        # invalid points of a lazily decoded message
+        raise ThresholdCryptoError("Invalid point: {}".format(e))
+
+    return EncryptedMessage(
+        em.C1, C2, em.ciphertext, None if key_epochs is None else key_epochs[1]
+    )
+
+
+def _re_encryption_required(
+    em: EncryptedMessage, key_epochs: Optional[Tuple[int, int]]
+) -> bool:
+    # re-encrypting a message twice or with the key of another epoch makes it undecryptable
+    if em.key_epoch is None:
+        return True
+
+    if key_epochs is None:
+        raise ThresholdCryptoError(
+            "Re-encrypting a message of key epoch {} requires the key epochs of the re-encryption key".format(
+                em.key_epoch
+            )
+        )
+
+    from_epoch, to_epoch = key_epochs
+    if em.key_epoch == from_epoch:
+        return True
+    elif em.key_epoch == to_epoch:
+        return False
+    else:
+        raise ThresholdCryptoError(
+            "Message of key epoch {} can not be re-encrypted from key epoch {}".format(
+                em.key_epoch, from_epoch
+            )
+        )
+
+
+class KeyEpochRegistry:
+    """
+    The public keys of the successive access structures (key epochs 0, 1, 2, ...) and the re-encryption keys between
+    consecutive epochs. The registry returns a single composed re-encryption key for any pair of epochs, so a message
+    which missed several access structure changes is brought up to date by one re-encryption.
+
+    The registry holds re-encryption keys and has to be protected like them.
+    """
+
+    def __init__(self, public_key: PublicKey):
+        """
+        Create a registry starting with epoch 0.
+
+        :param public_key: the public key of the first access structure
+        """
+        self._public_keys = [public_key]
+        # _offsets[e] = sum of the re-encryption keys from epoch 0 to epoch e, so the key from epoch a to b is
+        # _offsets[b] - _offsets[a]
+        self._offsets = [0]
+        self._composed_keys: Dict[Tuple[int, int], ReEncryptionKey] = {}
+
+    @property
+    def current_epoch(self) -> int:
+        """The epoch of the current access structure."""
+        return len(self._public_keys) - 1
+
+    @property
+    def curve_params(self) -> CurveParameters:
+        return self._public_keys[0].curve_params
+
+    def public_key(self, epoch: int) -> PublicKey:
+        """
+        Get the public key of an epoch.
+
+        :param epoch: the epoch
+        :return: the public key
+        """
+        self._check_epoch(epoch)
+        return self._public_keys[epoch]
+
+    def add_epoch(self, public_key: PublicKey, re_key: ReEncryptionKey) -> int:
+        """
+        Add the access structure following the current one.
+
+        :param public_key: the public key of the new access structure
+        :param re_key: the re-encryption key from the current to the new access structure
+        :return: the new epoch
+        """
+        if public_key.curve_params != self.curve_params or (
+            re_key.curve_params != self.curve_params
+        ):
+            raise ThresholdCryptoError("Varying curve parameters found in key epochs")
+
+        _check_re_encryption_key(
+            re_key.key, self.curve_params, self._public_keys[-1], public_key
+        )
+
+        self._public_keys.append(public_key)
+        self._offsets.append((self._offsets[-1] + re_key.key) % self.curve_params.order)
+
+        return self.current_epoch
+
+    def re_encryption_key(
+        self, from_epoch: int, to_epoch: Optional[int] = None
+    ) -> ReEncryptionKey:
+        """
+        Get the composed re-encryption key between two epochs, see compose_re_encryption_keys. The key is validated
+        against the public keys of both epochs and cached.
+
+        :param from_epoch: the epoch the messages are encrypted for
+        :param to_epoch: the target epoch (defaults to the current epoch)
+        :return: the re-encryption key
+        """
+        if to_epoch is None:
+            to_epoch = self.current_epoch
+
+        self._check_epoch(from_epoch)
+        self._check_epoch(to_epoch)
+
+        re_key = self._composed_keys.get((from_epoch, to_epoch))
+        if re_key is None:
+            curve_params = self.curve_params
+            key = (
+                self._offsets[to_epoch] - self._offsets[from_epoch]
+            ) % curve_params.order
+            _check_re_encryption_key(
+                key,
+                curve_params,
+                self._public_keys[from_epoch],
+                self._public_keys[to_epoch],
+            )
+
+            re_key = ReEncryptionKey(key, curve_params)
+            self._composed_keys[(from_epoch, to_epoch)] = re_key
+
+        return re_key
+
+    def _check_epoch(self, epoch: int):
+        if not 0 <= epoch <= self.current_epoch:
+            raise ThresholdCryptoError("Unknown key epoch {}".format(epoch))
+
+
+def re_encrypt_on_read(
+    encrypted_message: EncryptedMessage,
+    registry: KeyEpochRegistry,
+    write_back: Optional[Callable[[EncryptedMessage], None]] = None,
+) -> EncryptedMessage:
+    """
+    Bring a message tagged with a key epoch up to the current epoch of the registry right before its partial
+    decryptions are computed. Instead of re-encrypting all stored messages after each access structure change, only
+    the messages which are actually read are re-encrypted, each with a single composed re-encryption key.
+
+    Messages of the current epoch and untagged messages are returned unchanged. A re-encrypted message is a new object
+    tagged with the current epoch, the given message is not modified.
+
+    :param encrypted_message: the message tagged with the epoch of the public key it is encrypted for
+    :param registry: the key epochs
+    :param write_back: called with the re-encrypted message if the message was re-encrypted, e.g. to store it in
+        place of the given message so it is not re-encrypted on the next read
+    :return: the message decryptable by the key shares of the current epoch
+    """
+    key_epoch = encrypted_message.key_epoch
+    current_epoch = registry.current_epoch
+    if key_epoch is None or key_epoch == current_epoch:
+        return encrypted_message
+
+    re_key = registry.re_encryption_key(key_epoch, current_epoch)
+    re_encrypted_message = re_encrypt_message(
+        encrypted_message, re_key, (key_epoch, current_epoch)
+    )
+
+    if write_back is not None:
+        write_back(re_encrypted_message)
+
+    return re_encrypted_message
+
+
+DEFAULT_RE_ENCRYPTION_CHUNK_SIZE = 256
+
+
+class ReEncryptionProgress:
+    """
+    The progress of a bulk re-encryption by re_encrypt_messages or re_encrypt_store.
+    """
+
+    def __init__(self, resumed: int):
+        """
+        Start the progress of a run.
+
+        :param resumed: the number of messages re-encrypted by earlier runs according to the checkpoint
+        """
+        self.resumed = resumed
+        self.processed = 0
+        self.elapsed = 0.0
+        self._start = time.perf_counter()
+
+    @property
+    def throughput(self) -> float:
+        """The number of messages re-encrypted per second in this run."""
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def _update(self, processed: int):
+        self.processed += processed
+        self.elapsed = time.perf_counter() - self._start
+
+    def __str__(self):
+        return "Re-encrypted {} messages in {:.1f}s ({:.1f} messages/s, {} resumed from checkpoint)".format(
+            self.processed, self.elapsed, self.throughput, self.resumed
+        )
+
+
+def re_encrypt_messages(
+    encrypted_messages: Iterable[EncryptedMessage],
+    re_key: ReEncryptionKey,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_RE_ENCRYPTION_CHUNK_SIZE,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[ReEncryptionProgress], None]] = None,
+    key_epochs: Optional[Tuple[int, int]] = None,
+) -> Iterator[EncryptedMessage]:
+    """
+    Re-encrypt many messages using the same re-encryption key, see re_encrypt_message. Only C2 and the key epoch
+    change, so they are replaced in place and the given message objects are yielded in their order. The
+    re-encryptions are distributed in chunks over a pool of worker processes and the messages are consumed lazily.
+
+    With a checkpoint path the number of handled messages is saved after each chunk. A message counts as handled once
+    the next one is requested, so write each yielded message back to its store before continuing the iteration. A new
+    run with the same checkpoint path and the same messages skips the handled ones. Re-encrypting a message twice
+    makes it undecryptable. Messages tagged with the target epoch are left unchanged, so with key epochs the messages
+    written back after the last checkpoint are skipped as well. For untagged messages the messages of the last chunk
+    have to be checked if the job stops between writing back messages and saving the checkpoint.
+
+    :param encrypted_messages: the encrypted messages in a stable order
+    :param re_key: the re-encryption key
+    :param workers: the number of worker processes (defaults to the number of CPUs, 1 re-encrypts in this process)
+    :param chunk_size: the number of messages sent to a worker at once and between two checkpoints
+    :param checkpoint_path: the file storing the progress, None for no checkpoints
+    :param progress: called with the progress including the throughput after each chunk
+    :param key_epochs: the optional key epochs (from_epoch, to_epoch) of the re-encryption key, see
+        re_encrypt_message
+    :return: the re-encrypted messages
+    """
+    stats = ReEncryptionProgress(
+        _load_re_encryption_checkpoint(checkpoint_path, re_key)
+    )
+    messages = itertools.islice(encrypted_messages, stats.resumed, None)
+
+    return _re_encrypt(
+        messages,
+        re_key,
+        workers,
+        chunk_size,
+        checkpoint_path,
+        progress,
+        key_epochs,
+        stats,
+    )
+
+
+def re_encrypt_store(
+    store: MutableSequence[EncryptedMessage],
+    re_key: ReEncryptionKey,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_RE_ENCRYPTION_CHUNK_SIZE,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[ReEncryptionProgress], None]] = None,
+    key_epochs: Optional[Tuple[int, int]] = None,
+) -> ReEncryptionProgress:
+    """
+    Re-encrypt all messages of a store in place using the same re-encryption key, see re_encrypt_messages. Each
+    message is written back using store[index] = message, so any object supporting len, indexing and item assignment
+    like a list or a wrapper of a database table can be used.
+
+    :param store: the encrypted messages
+    :param re_key: the re-encryption key
+    :param workers: the number of worker processes (defaults to the number of CPUs, 1 re-encrypts in this process)
+    :param chunk_size: the number of messages sent to a worker at once and between two checkpoints
+    :param checkpoint_path: the file storing the progress, None for no checkpoints
+    :param progress: called with the progress including the throughput after each chunk
+    :param key_epochs: the optional key epochs (from_epoch, to_epoch) of the re-encryption key, see
+        re_encrypt_message
+    :return: the progress of this run
+    """
+    stats = ReEncryptionProgress(
+        _load_re_encryption_checkpoint(checkpoint_path, re_key)
+    )
+    messages = (store[index] for index in range(stats.resumed, len(store)))
+
+    re_encrypted = _re_encrypt(
+        messages,
+        re_key,
+        workers,
+        chunk_size,
+        checkpoint_path,
+        progress,
+        key_epochs,
+        stats,
+    )
+    for index, em in enumerate(re_encrypted, stats.resumed):
+        store[index] = em
+
+    return stats
+
+
+def _re_encrypt(
+    messages: Iterable[EncryptedMessage],
+    re_key: ReEncryptionKey,
+    workers: Optional[int],
+    chunk_size: int,
+    checkpoint_path: Optional[str],
+    progress: Optional[Callable[[ReEncryptionProgress], None]],
+    key_epochs: Optional[Tuple[int, int]],
+    stats: ReEncryptionProgress,
+) -> Iterator[EncryptedMessage]:
+    to_epoch = None if key_epochs is None else key_epochs[1]
+
+    for chunk, C2s in _re_encrypted_chunks(messages, re_key, workers, chunk_size):
+        for em, C2 in zip(chunk, C2s):
+            if _re_encryption_required(em, key_epochs):
+                em.C2 = C2
+                em.key_epoch = to_epoch
+            yield em
+
+        # the next message was requested, so the chunk has been handled by the consumer
+        stats._update(len(chunk))
+        if checkpoint_path is not None:
+            _save_re_encryption_checkpoint(
+                checkpoint_path, re_key, stats.resumed + stats.processed
+            )
+        if progress is not None:
+            progress(stats)
+
+
+def _re_encrypted_chunks(
+    messages: Iterable[EncryptedMessage],
+    re_key: ReEncryptionKey,
+    workers: Optional[int],
+    chunk_size: int,
+) -> Iterator[Tuple[List[EncryptedMessage], List[ECC.EccPoint]]]:
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    chunks = _chunks(messages, chunk_size)
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, [_re_encrypted_C2(em.C1, em.C2, re_key.key) for em in chunk]
+
+        return
+
+    backend = re_key.curve_params.backend
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_re_encryption_worker,
+        initargs=(re_key.to_json(),),
+    ) as executor:
+        # limit the number of chunks in flight to consume the messages lazily
+        pending = collections.deque()
+        for chunk in chunks:
+            coordinates = group.affine_coordinates(
+                [p for em in chunk for p in (em.C1, em.C2)]
+            )
+            pending.append((chunk, executor.submit(_re_encrypt_chunk, coordinates)))
+
+            if len(pending) >= 2 * workers:
+                yield _decode_re_encrypted_chunk(*pending.popleft(), backend)
+
+        while pending:
+            yield _decode_re_encrypted_chunk(*pending.popleft(), backend)
+
+
+def _re_encrypted_C2(C1: ECC.EccPoint, C2: ECC.EccPoint, key: int) -> ECC.EccPoint:
+    re_enc_c = number.ecc_mul(C1, key)
+    re_enc_c += C2
+    return re_enc_c
+
+
+_worker_re_key: Optional[ReEncryptionKey] = None
+
+
+def _init_re_encryption_worker(re_key_json: str):
+    global _worker_re_key
+    _worker_re_key = ReEncryptionKey.from_json(re_key_json)
+
+
+def _re_encrypt_chunk(coordinates: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # the coordinates of C1 and C2 of each message in turn
+    backend = _worker_re_key.curve_params.backend
+    points = [backend.point(x, y) for x, y in coordinates]
+
+    return group.affine_coordinates(
+        [
+            _re_encrypted_C2(points[i], points[i + 1], _worker_re_key.key)
+            for i in range(0, len(points), 2)
+        ]
+    )
+
+
+def _decode_re_encrypted_chunk(
+    chunk: List[EncryptedMessage], future: Any, backend: group.GroupBackend
+) -> Tuple[List[EncryptedMessage], List[ECC.EccPoint]]:
+    # the coordinates were computed from valid points, so they are decoded on first use only
+    return chunk, [backend.lazy_point(x, y) for x, y in future.result()]
+
+
+def _re_key_fingerprint(re_key: ReEncryptionKey) -> str:
+    # identifies the key in checkpoints without storing it
+    return nacl.hash.blake2b(
+        re_key.to_bytes(), digest_size=16, encoder=nacl.encoding.HexEncoder
+    ).decode("ascii")
+
+
+def _load_re_encryption_checkpoint(
+    checkpoint_path: Optional[str], re_key: ReEncryptionKey
+) -> int:
+    if checkpoint_path is None or not os.path.exists(checkpoint_path):
+        return 0
+
+    try:
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        fingerprint = checkpoint["key"]
+        processed = int(checkpoint["processed"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ThresholdCryptoError("Invalid re-encryption checkpoint: " + str(e))
+
+    if fingerprint != _re_key_fingerprint(re_key):
+        raise ThresholdCryptoError(
+            "Re-encryption checkpoint belongs to another re-encryption key"
+        )
+
+    return processed
+
 
-    return EncryptedMessage(em.C1, re_enc_c, em.ciphertext)
+def _save_re_encryption_checkpoint(
+    checkpoint_path: str, re_key: ReEncryptionKey, processed: int
+):
+    # replace the checkpoint atomically, so an interruption leaves the old or the new one
+    temp_path = checkpoint_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"key": _re_key_fingerprint(re_key), "processed": processed}, f)
+    os.replace(temp_path, checkpoint_path)
@@ -1,102 +1,530 @@
 import base64
 from collections.abc import Mapping
 import json
-from typing import Iterable, List, Any, Dict
+from typing import Iterable, Iterator, List, Any, Callable, Dict, Optional, Tuple
 
 from Crypto.PublicKey import ECC
 
+from threshold_crypto import group, number
+
 
 class ThresholdCryptoError(Exception):
     pass
 
 
-# helper functions for serializing ECC.EccPoint
+# field kinds of the data class schemas
+_INT = 0  # non-negative integer
+_SCALAR = 1  # integer modulo the group order
+_BYTES = 2
+_POINT = 3
+_POINT_LIST = 4
+_INT_SET = 5
+_CURVE = 6  # curve parameters
+_OPTIONAL_INT = 7  # non-negative integer or None, optional fields have to be the last fields of a schema
 
 
-def _ecc_point_to_serializable(p: ECC.EccPoint) -> Dict[str, Any]:
-    return {
-        "x": int(p.x),
-        "y": int(p.y),
-        "curve": p._curve_name,
-    }
+# helper functions for serializing points (ECC.EccPoint or points of other group backends)
 
 
-def _is_ecc_point_list(value):
-    if isinstance(value, list):
-        return all(isinstance(item, ECC.EccPoint) for item in value)
-    return False
+def _ecc_point_to_serializable(
+    p: ECC.EccPoint, curve_name: Optional[str] = None
+) -> Dict[str, Any]:
+    return _ecc_points_to_serializable([p], curve_name)[0]
 
 
-def _is_serialized_ecc_point(value):
-    return (
-        isinstance(value, Mapping)
-        and "x" in value
-        and "y" in value
-        and "curve" in value
-    )
+def _ecc_points_to_serializable(
+    points: List[ECC.EccPoint], curve_name: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    # PyCryptodome names the curve of its points canonically (e.g. "NIST P-256"), the curve name of the object holding
+    # the points (e.g. "P-256") is written instead if it denotes the same group
+    return [
+        {
+            "x": x,
+            "y": y,
+            "curve": _serialized_curve_name(p.curve, curve_name),
+        }
+        for p, (x, y) in zip(points, group.affine_coordinates(points))
+    ]
+
+
+def _serialized_curve_name(point_curve: str, curve_name: Optional[str]) -> str:
+    if curve_name is None or curve_name == point_curve:
+        return point_curve
+    if group.get_backend(curve_name) is group.get_backend(point_curve):
+        return curve_name
+    return point_curve
+
+
+def _ecc_point_from_serializable(value: Mapping):
+    return group.get_backend(value["curve"]).point(value["x"], value["y"])
+
+
+def _lazy_ecc_point_from_serializable(value: Mapping):
+    return group.get_backend(value["curve"]).lazy_point(value["x"], value["y"])
+
+
+# helper functions for the json format, the encoder and decoder for each field kind
+
+
+def _bytes_to_serializable(value: bytes) -> Any:
+    # other values (e.g. integer commitments) are passed on unchanged, as before the schemas
+    if not isinstance(value, bytes):
+        return value
+    return ThresholdDataClass.BASE64_MAGIC + base64.b64encode(value).decode("ascii")
+
 
+def _bytes_from_serializable(value: Any) -> bytes:
+    if isinstance(value, str) and value.startswith(ThresholdDataClass.BASE64_MAGIC):
+        return base64.b64decode(
+            value[len(ThresholdDataClass.BASE64_MAGIC) :].encode("ascii")
+        )
+    return value
+
+
+def _curve_to_serializable(value: "CurveParameters") -> str:
+    return ThresholdDataClass.CURVE_MAGIC + value._name
+
+
+def _curve_from_serializable(value: str) -> "CurveParameters":
+    return CurveParameters(curve_name=value[len(ThresholdDataClass.CURVE_MAGIC) :])
+
+
+def _unchanged(value: Any) -> Any:
+    return value
+
+
+_JSON_ENCODERS = {
+    _INT: _unchanged,
+    _SCALAR: _unchanged,
+    _BYTES: _bytes_to_serializable,
+    _POINT: _ecc_point_to_serializable,
+    _POINT_LIST: _ecc_points_to_serializable,
+    _INT_SET: sorted,
+    _CURVE: _curve_to_serializable,
+    _OPTIONAL_INT: _unchanged,
+}
+
+_JSON_DECODERS = {
+    _INT: _unchanged,
+    _SCALAR: _unchanged,
+    _BYTES: _bytes_from_serializable,
+    _POINT: _ecc_point_from_serializable,
+    _POINT_LIST: lambda values: [_ecc_point_from_serializable(v) for v in values],
+    _INT_SET: _unchanged,
+    _CURVE: _curve_from_serializable,
+    _OPTIONAL_INT: _unchanged,
+}
+
+# the decoders of from_json in lazy mode
+_LAZY_JSON_DECODERS = {
+    **_JSON_DECODERS,
+    _POINT: _lazy_ecc_point_from_serializable,
+    _POINT_LIST: lambda values: [_lazy_ecc_point_from_serializable(v) for v in values],
+}
+
+
+# helper functions for the binary format
+#
+# An encoded object consists of a header of three bytes (format version, type id of the class and curve id) followed
+# by the fields of the class in the order of its schema:
+# - _INT: length (varint) followed by the big-endian value
+# - _SCALAR: big-endian with the fixed width of the group order
+# - _BYTES: length (varint) followed by the bytes
+# - _POINT: encoded by the group backend
+# - _POINT_LIST and _INT_SET: number of items (varint) followed by the (sorted) items
+# - _CURVE: not encoded, given by the curve id of the header
+# - _OPTIONAL_INT: not encoded at all for None, so objects without the optional values keep the encoding of older
+#   schemas, otherwise value + 1 like _INT (which keeps a trailing zero byte invalid)
+# The curve id is 0 for objects without curve dependent fields.
+
+BINARY_FORMAT_VERSION = 1
+
+_BINARY_CURVES = {
+    1: "P-192",
+    2: "P-224",
+    3: "P-256",
+    4: "P-384",
+    5: "P-521",
+    6: "Ed25519",
+    7: "Ed448",
+    8: group.LIBSODIUM_ED25519,
+}
+
+_BINARY_CURVE_IDS = {
+    group.get_backend(curve_name).name: curve_id
+    for curve_id, curve_name in _BINARY_CURVES.items()
+}
+
+
+def _encode_varint(out: bytearray, value: int):
+    # unsigned LEB128
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _encode_int(out: bytearray, value: int):
+    if value < 0:
+        raise ThresholdCryptoError("Negative integers can not be encoded")
+    encoded = number.int_to_bytes(value)
+    _encode_varint(out, len(encoded))
+    out += encoded
+
+
+def _decode_int(data: bytes, offset: int) -> Tuple[int, int]:
+    length, offset = _decode_varint(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise ValueError("Truncated integer")
+    return int.from_bytes(data[offset:end], "big"), end
+
+
+def _check_point_curve(point, backend: group.GroupBackend):
+    if group.get_backend(point.curve) is not backend:
+        raise ThresholdCryptoError("All points of an object must be on the same curve")
+
+
+def _encode_field(
+    out: bytearray,
+    kind: int,
+    value: Any,
+    backend: Optional[group.GroupBackend],
+    compressed: bool,
+):
+    if kind == _INT:
+        _encode_int(out, value)
+    elif kind == _OPTIONAL_INT:
+        if value is not None:
+            _encode_int(out, value + 1)
+    elif kind == _SCALAR:
+        try:
+            out += value.to_bytes(backend.scalar_size, "big")
+        except OverflowError:
+            raise ThresholdCryptoError("Scalar out of range")
+    elif kind == _BYTES:
+        _encode_varint(out, len(value))
+        out += value
+    elif kind == _POINT:
+        _check_point_curve(value, backend)
+        out += backend.encode_point(value, compressed)
+    elif kind == _POINT_LIST:
+        _encode_varint(out, len(value))
+        if value:
+            for point in value:
+                _check_point_curve(point, backend)
+            out += b"".join(backend.encode_points(value, compressed))
+    elif kind == _INT_SET:
+        _encode_varint(out, len(value))
+        for item in sorted(value):
+            _encode_int(out, item)
+    elif kind != _CURVE:
+        raise ValueError("Unknown field kind {}".format(kind))
+
+
+def _decode_field(
+    data: bytes, offset: int, kind: int, backend: Optional[group.GroupBackend]
+) -> Tuple[Any, int]:
+    if kind == _INT:
+        return _decode_int(data, offset)
+
+    if kind == _BYTES:
+        length, offset = _decode_varint(data, offset)
+        end = offset + length
+        if end > len(data):
+            raise ValueError("Truncated bytes")
+        return bytes(data[offset:end]), end
+
+    if kind == _POINT_LIST:
+        count, offset = _decode_varint(data, offset)
+        if count and backend is None:
+            raise ValueError("Missing curve id")
+        points = []
+        for _ in range(0, count):
+            point, offset = backend.decode_point(data, offset)
+            points.append(point)
+        return points, offset
+
+    if kind == _INT_SET:
+        count, offset = _decode_varint(data, offset)
+        items = set()
+        for _ in range(0, count):
+            item, offset = _decode_int(data, offset)
+            items.add(item)
+        return items, offset
+
+    # all remaining kinds depend on the curve
+    if backend is None:
+        raise ValueError("Missing curve id")
+
+    if kind == _SCALAR:
+        end = offset + backend.scalar_size
+        if end > len(data):
+            raise ValueError("Truncated scalar")
+        return int.from_bytes(data[offset:end], "big"), end
+    elif kind == _POINT:
+        return backend.decode_point(data, offset)
+    else:
+        raise ValueError("Unknown field kind {}".format(kind))
+
+
+def _decode_object(
+    data: bytes, offset: int, end: int, expected_cls: type
+) -> Tuple["ThresholdDataClass", int]:
+    if len(data) < offset + 3:
+        raise ValueError("Truncated header")
+
+    version, type_id, curve_id = data[offset : offset + 3]
+    if version != BINARY_FORMAT_VERSION:
+        raise ThresholdCryptoError(
+            "Unsupported binary format version {}".format(version)
+        )
+
+    cls = _BINARY_TYPES.get(type_id)
+    if cls is None or not issubclass(cls, expected_cls):
+        raise ThresholdCryptoError(
+            "Binary data does not contain a {}".format(expected_cls.__name__)
+        )
+
+    curve_name = None
+    backend = None
+    if curve_id != 0:
+        if curve_id not in _BINARY_CURVES:
+            raise ThresholdCryptoError("Unknown curve id {}".format(curve_id))
+        curve_name = _BINARY_CURVES[curve_id]
+        backend = group.get_backend(curve_name)
+
+    offset += 3
+    values = {}
+    for name, kind in cls._FIELDS:
+        if kind == _CURVE:
+            if curve_name is None:
+                raise ValueError("Missing curve id")
+            values[name] = CurveParameters(curve_name)
+        elif kind == _OPTIONAL_INT:
+            # omitted optional values end the object
+            if offset == end:
+                values[name] = None
+            else:
+                value, offset = _decode_int(data, offset)
+                if value == 0:
+                    raise ValueError("Invalid optional value")
+                values[name] = value - 1
+        else:
+            values[name], offset = _decode_field(data, offset, kind, backend)
+
+    return cls._from_binary_fields(values, curve_name), offset
+
+
+def sequence_to_bytes(
+    objects: Iterable["ThresholdDataClass"], compressed: bool = True
+) -> bytes:
+    """
+    Encode a sequence of data class objects (possibly of different classes) in the binary format. Each object is
+    prefixed with the length of its encoding, so the sequence can be decoded without knowing the object count.
+
+    :param objects: the objects
+    :param compressed: whether to use compressed point encodings
+    :return: the encoded sequence
+    """
+    out = bytearray()
+    for obj in objects:
+        encoded = obj.to_bytes(compressed)
+        _encode_varint(out, len(encoded))
+        out += encoded
+
+    return bytes(out)
+
+
+def sequence_from_bytes(data: bytes) -> List["ThresholdDataClass"]:
+    """
+    Decode a sequence encoded by sequence_to_bytes.
 
-def _is_serialized_ecc_point_list(value):
-    if isinstance(value, list):
-        return all(_is_serialized_ecc_point(item) for item in value)
-    return False
+    :param data: the encoded sequence
+    :return: the objects
+    """
+    objects = []
+    offset = 0
+    try:
+        while offset < len(data):
+            length, offset = _decode_varint(data, offset)
+            end = offset + length
+            obj, obj_end = _decode_object(data, offset, end, ThresholdDataClass)
+            if obj_end != end:
+                raise ValueError("Frame length does not match the encoded object")
+            objects.append(obj)
+            offset = end
+    except (ValueError, IndexError) as e:
+        raise ThresholdCryptoError("Invalid binary data: {}".format(e))
+
+    return objects
 
 
 class ThresholdDataClass:
     """Baseclass for ThresholdCrypto data classes."""
 
+    # The data classes store their attributes in slots instead of a per instance __dict__, which considerably reduces
+    # their memory footprint. The attributes of subclasses have to be listed in their __slots__.
+    __slots__ = ()
+
     BASE64_MAGIC = "BASE64|"
     CURVE_MAGIC = "ECURVE|"
 
+    # The schema of the class: its serialized fields as (attribute name, field kind) pairs in the order of the json
+    # representation. It drives the json and the binary format, see _json_fields for the compiled form.
+    _FIELDS: Tuple[Tuple[str, int], ...] = ()
+    _json_fields: Tuple[Tuple[str, Callable, Callable, Callable], ...] = ()
+    # the fields which are left out of the json representation if they are None
+    _optional_fields: frozenset = frozenset()
+    # the point fields, which are written with the curve name of the curve parameters of the object
+    _point_fields: frozenset = frozenset()
+
+    # the type id of the class in the binary format
+    _BINARY_TYPE_ID = 0
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._json_fields = tuple(
+            (
+                name,
+                _JSON_ENCODERS[kind],
+                _JSON_DECODERS[kind],
+                _LAZY_JSON_DECODERS[kind],
+            )
+            for name, kind in cls._FIELDS
+        )
+        cls._optional_fields = frozenset(
+            name for name, kind in cls._FIELDS if kind == _OPTIONAL_INT
+        )
+        cls._point_fields = frozenset(
+            name for name, kind in cls._FIELDS if kind in (_POINT, _POINT_LIST)
+        )
+
     def __init__(self):
         raise NotImplementedError(
             "Implement __init__ in subclass when using ThresholdDataClass"
         )
 
     def to_json(self):
-        """Create json representation of object. Some special cases are already handled here."""
-        data_dict = self.__dict__.copy()
+        """
+        Create json representation of object according to the schema of the class. Points are written with the curve
+        name of the curve parameters of the object (as given by the caller), objects without curve parameters write the
+        canonical curve name of their points.
+        """
+        curve_params = getattr(self, "curve_params", None)
+        curve_name = None if curve_params is None else curve_params._name
+
+        data_dict = {}
+        for name, encode, _, _ in self._json_fields:
+            value = getattr(self, name)
+            if value is None and name in self._optional_fields:
+                continue
+            if value is None:
+                data_dict[name] = None
+            elif name in self._point_fields:
+                data_dict[name] = encode(value, curve_name)
+            else:
+                data_dict[name] = encode(value)
 
-        for k, val in data_dict.items():
-            # special handling of bytes
-            if isinstance(val, bytes):
-                data_dict[k] = self.BASE64_MAGIC + base64.b64encode(val).decode("ascii")
+        return json.dumps(data_dict)
 
-            # special handling of curve parameters
-            if isinstance(val, CurveParameters):
-                data_dict[k] = self.CURVE_MAGIC + val._name
+    @classmethod
+    def from_json(cls, json_str: str, lazy: bool = False):
+        """
+        Create object from json representation according to the schema of the class.
 
-            # special handling of curve points
-            if isinstance(val, ECC.EccPoint):
-                data_dict[k] = _ecc_point_to_serializable(val)
+        :param json_str: the json representation
+        :param lazy: if True, points are neither validated nor converted before their first arithmetic use (or a call
+            of validate), which saves all curve arithmetic for objects which are only forwarded or stored
+        :return: the object
+        """
+        dict = json.loads(json_str)
 
-            if _is_ecc_point_list(val):
-                data_dict[k] = [_ecc_point_to_serializable(p) for p in val]
+        for name, _, decode, lazy_decode in cls._json_fields:
+            value = dict.get(name)
+            if value is not None:
+                dict[name] = lazy_decode(value) if lazy else decode(value)
 
-        return json.dumps(data_dict)
+        return cls(**dict)
+
+    def validate(self):
+        """
+        Make sure all points of the object are valid group elements. For objects created by from_json in lazy mode this
+        decodes all points at once, for other objects it has nothing left to do.
+        """
+        for name, kind in self._FIELDS:
+            if kind == _POINT:
+                points = [getattr(self, name)]
+            elif kind == _POINT_LIST:
+                points = getattr(self, name)
+            else:
+                continue
+
+            try:
+                group.decode_lazy_points(points)
+            except ValueError as e:
+                raise ThresholdCryptoError("Invalid point {}: {}".format(name, e))
+
+    def to_bytes(self, compressed: bool = True) -> bytes:
+        """
+        Create the binary representation of the object.
+
+        :param compressed: whether to use compressed point encodings. They are about half the size, but decoding
+            requires a modular square root per point (except for libsodium points, which are always compressed).
+        :return: the encoding
+        """
+        backend = self._binary_backend()
+        curve_id = 0 if backend is None else _BINARY_CURVE_IDS[backend.name]
+
+        out = bytearray((BINARY_FORMAT_VERSION, self._BINARY_TYPE_ID, curve_id))
+        for name, kind in self._FIELDS:
+            _encode_field(out, kind, getattr(self, name), backend, compressed)
+
+        return bytes(out)
 
     @classmethod
-    def from_json(cls, json_str: str):
-        """Create object from json representation. Some special cases are already handled here."""
-        dict = json.loads(json_str)
+    def from_bytes(cls, data: bytes):
+        """
+        Create object from binary representation. Called on ThresholdDataClass, objects of any data class are decoded.
+        """
+        try:
+            obj, end = _decode_object(data, 0, len(data), cls)
+        except (ValueError, IndexError) as e:
+            raise ThresholdCryptoError("Invalid binary data: {}".format(e))
 
-        for k, val in dict.items():
-            # special handling of bytes
-            if isinstance(val, str) and val.startswith(cls.BASE64_MAGIC):
-                dict[k] = base64.b64decode(val[len(cls.BASE64_MAGIC) :].encode("ascii"))
+        if end != len(data):
+            raise ThresholdCryptoError("Invalid binary data: trailing bytes")
 
-            # special handling of curve parameters
-            if isinstance(val, str) and val.startswith(cls.CURVE_MAGIC):
-                dict[k] = CurveParameters(curve_name=val[len(cls.CURVE_MAGIC) :])
+        return obj
 
-            # special handling of curve points
-            if _is_serialized_ecc_point(val):
-                dict[k] = ECC.EccPoint(**val)
+    def _binary_backend(self) -> Optional[group.GroupBackend]:
+        # the group of the curve dependent fields, which determines the curve id of the header
+        for name, kind in self._FIELDS:
+            value = getattr(self, name)
+            if kind == _CURVE:
+                return value.backend
+            elif kind == _POINT:
+                return group.get_backend(value.curve)
+            elif kind == _POINT_LIST and value:
+                return group.get_backend(value[0].curve)
 
-            if _is_serialized_ecc_point_list(dict[k]):
-                dict[k] = [ECC.EccPoint(**s_point) for s_point in val]
+        return None
 
-        return cls(**dict)
+    @classmethod
+    def _from_binary_fields(cls, values: Dict[str, Any], curve_name: Optional[str]):
+        return cls(**values)
 
 
 class ThresholdParameters(ThresholdDataClass):
@@ -109,6 +537,14 @@ class ThresholdParameters(ThresholdDataClass):
     At least t out of overall n share owners must participate to decrypt an encrypted message.
     """
 
+    __slots__ = ("t", "n")
+
+    _BINARY_TYPE_ID = 1
+    _FIELDS = (
+        ("t", _INT),
+        ("n", _INT),
+    )
+
     def __init__(self, t: int, n: int):
         """
         Construct threshold parameter. Required:
@@ -138,34 +574,101 @@ class ThresholdParameters(ThresholdDataClass):
 
 class CurveParameters(ThresholdDataClass):
     """
-    Contains the curve parameters the scheme uses. Since PyCryptodome is used, only curves present there are available:
+    Contains the curve parameters the scheme uses. Available are the curves present in PyCryptodome:
     https://pycryptodome.readthedocs.io/en/latest/src/public_key/ecc.html
+    and the prime order subgroup of Ed25519 using libsodium (curve name group.LIBSODIUM_ED25519).
+
+    There is one shared instance per curve name, so the generator point P must never be modified in place.
     """
 
+    __slots__ = ("_backend", "_name", "P", "_base_table")
+
+    _BINARY_TYPE_ID = 2
+
     DEFAULT_CURVE = "P-256"
 
-    def __init__(self, curve_name: str = DEFAULT_CURVE):
+    # the shared instances by curve name
+    _instances: Dict[str, "CurveParameters"] = {}
+
+    def __new__(cls, curve_name: str = DEFAULT_CURVE):
         """
-        Construct the curve from a given curve name (according to curves present in PyCryptodome).
+        Return the curve from a given curve name (according to curves present in PyCryptodome or
+        group.LIBSODIUM_ED25519). Instances are shared: all calls for the same curve name return the same object,
+        so the generator point and its precomputed table exist once per process.
 
         :param curve_name:
         """
-        if curve_name not in ECC._curves:
-            raise ThresholdCryptoError("Unsupported curve: " + curve_name)
+        instance = cls._instances.get(curve_name)
+        if instance is None:
+            try:
+                backend = group.get_backend(curve_name)
+            except ValueError:
+                raise ThresholdCryptoError("Unsupported curve: " + curve_name)
+
+            instance = super().__new__(cls)
+            instance._backend = backend
+            instance._name = curve_name
+            instance.P = backend.generator()
+            instance._base_table = None
 
-        self._name = curve_name
-        self._curve = ECC._curves[curve_name]
-        self.P = ECC.EccPoint(x=self._curve.Gx, y=self._curve.Gy, curve=curve_name)
+            # another thread might have registered an instance in the meantime
+            instance = cls._instances.setdefault(curve_name, instance)
+
+        return instance
+
+    def __init__(self, curve_name: str = DEFAULT_CURVE):
+        # the shared instances are completely initialized by __new__
+        pass
+
+    def __reduce__(self):
+        # copies and unpickled objects resolve to the shared instance
+        return self.__class__, (self._name,)
 
     @property
     def order(self):
-        return int(self._curve.order)
+        return self._backend.order
+
+    @property
+    def backend(self) -> group.GroupBackend:
+        return self._backend
+
+    def mul_base(self, scalar: int) -> ECC.EccPoint:
+        """
+        Compute scalar * P for the generator point P. The precomputed table for P is built on first use.
+
+        :param scalar: the scalar
+        :return: the resulting point
+        """
+        if not self._backend.precomputation:
+            return scalar * self.P
+
+        table = self._base_table
+        if table is None:
+            table = number.FixedBaseTable(self.P, self.order)
+            self._base_table = table
+
+        return table.multiply(scalar)
 
     def to_json(self):
         return json.dumps({"curve_name": self._name})
 
+    def _binary_backend(self) -> Optional[group.GroupBackend]:
+        return self._backend
+
+    @classmethod
+    def _from_binary_fields(cls, values: Dict[str, Any], curve_name: Optional[str]):
+        if curve_name is None:
+            raise ValueError("Missing curve id")
+        return cls(curve_name)
+
     def __eq__(self, other):
-        return isinstance(other, self.__class__) and self._curve == other._curve
+        # different names of the same curve (e.g. "P-256" and "secp256r1") have separate instances sharing the backend
+        return self is other or (
+            isinstance(other, self.__class__) and self._backend is other._backend
+        )
+
+    def __hash__(self):
+        return hash(self._backend.name)
 
     def __str__(self):
         return "Curve {} of order {} with generator point P = {}".format(
@@ -178,6 +681,17 @@ class PublicKey(ThresholdDataClass):
     The public key point Q linked to the (implicit) secret key d of the scheme.
     """
 
+    __slots__ = ("Q", "curve_params", "_Q_window", "_Q_table")
+
+    _BINARY_TYPE_ID = 3
+    _FIELDS = (
+        ("Q", _POINT),
+        ("curve_params", _CURVE),
+    )
+
+    PREPARED_WINDOW = 6
+    MAX_PREPARED_WINDOW = 8
+
     def __init__(
         self, Q: ECC.EccPoint, curve_params: CurveParameters = CurveParameters()
     ):
@@ -189,6 +703,52 @@ class PublicKey(ThresholdDataClass):
         """
         self.Q = Q
         self.curve_params = curve_params
+        self._Q_window: Optional[int] = None
+        self._Q_table: Optional[number.FixedBaseTable] = None
+
+    def prepare(self, window: int = PREPARED_WINDOW) -> "PublicKey":
+        """
+        Switch this key to prepared mode: a precomputed table for Q is built on the first multiplication and used
+        for all following ones. This pays off when many messages are encrypted under the same key.
+        The table holds 2^window * ceil(log2(order) / window) points, for P-256 2752 with the default window and 8192
+        with the maximum window.
+
+        :param window: the window width of the table in range [1, MAX_PREPARED_WINDOW]
+        :return: this public key
+        """
+        if not 1 <= window <= self.MAX_PREPARED_WINDOW:
+            raise ThresholdCryptoError(
+                "Window {} not in range [1, {}]".format(
+                    window, self.MAX_PREPARED_WINDOW
+                )
+            )
+
+        if window != self._Q_window:
+            self._Q_window = window
+            self._Q_table = None
+
+        return self
+
+    @property
+    def prepared(self) -> bool:
+        return self._Q_window is not None
+
+    def mul_Q(self, scalar: int) -> ECC.EccPoint:
+        """
+        Compute scalar * Q, using the precomputed table for Q in prepared mode.
+
+        :param scalar: the scalar
+        :return: the resulting point
+        """
+        if self._Q_window is None or not self.curve_params.backend.precomputation:
+            return scalar * self.Q
+
+        if self._Q_table is None:
+            self._Q_table = number.FixedBaseTable(
+                self.Q, self.curve_params.order, self._Q_window
+            )
+
+        return self._Q_table.multiply(scalar)
 
     def __eq__(self, other):
         return (
@@ -209,6 +769,15 @@ class KeyShare(ThresholdDataClass):
     y_i is the evaluated polynom value of x_i in shamirs secret sharing.
     """
 
+    __slots__ = ("x", "y", "curve_params")
+
+    _BINARY_TYPE_ID = 4
+    _FIELDS = (
+        ("x", _INT),
+        ("y", _SCALAR),
+        ("curve_params", _CURVE),
+    )
+
     def __init__(self, x: int, y: int, curve_params: CurveParameters):
         """
         Construct a share of the private key d.
@@ -246,6 +815,9 @@ class EncryptedMessage(ThresholdDataClass):
 
     The symmetric key is derived from the ElGamal encrypted point rP.
 
+    Optionally the message is tagged with the key epoch of the access structure it is encrypted for (see
+    KeyEpochRegistry), which allows to re-encrypt it lazily when it is read (see re_encrypt_on_read).
+
     Note: The ECIES approach for ECC
     - chooses a random r,
     - computes R=rP and S=rQ,
@@ -254,17 +826,38 @@ class EncryptedMessage(ThresholdDataClass):
     But to enable the re-encryption of ciphertexts, here the approach similar to regular ElGamal is used instead.
     """
 
-    def __init__(self, C1: ECC.EccPoint, C2: ECC.EccPoint, ciphertext: bytes):
+    __slots__ = ("C1", "C2", "ciphertext", "key_epoch")
+
+    _BINARY_TYPE_ID = 5
+    _FIELDS = (
+        ("C1", _POINT),
+        ("C2", _POINT),
+        ("ciphertext", _BYTES),
+        ("key_epoch", _OPTIONAL_INT),
+    )
+
+    def __init__(
+        self,
+        C1: ECC.EccPoint,
+        C2: ECC.EccPoint,
+        ciphertext: bytes,
+        key_epoch: Optional[int] = None,
+    ):
         """
         Construct a encrypted message.
 
         :param v: like in ElGamal scheme
         :param c: like in ElGamal scheme
         :param ciphertext: the symmetrically encrypted message
+        :param key_epoch: the optional key epoch of the public key the message is encrypted for
         """
+        if key_epoch is not None and key_epoch < 0:
+            raise ThresholdCryptoError("Invalid key epoch {}".format(key_epoch))
+
         self.C1 = C1
         self.C2 = C2
         self.ciphertext = ciphertext
+        self.key_epoch = key_epoch
 
     def __eq__(self, other):
         return (
@@ -272,19 +865,112 @@ class EncryptedMessage(ThresholdDataClass):
             and self.C1 == other.C1
             and self.C2 == other.C2
             and self.ciphertext == other.ciphertext
+            and self.key_epoch == other.key_epoch
         )
 
     def __str__(self):
+        if self.key_epoch is not None:
+            return "EncryptedMessage (C1, C2, ciphertext, key_epoch) = ({}, {}, {}, {}))".format(
+                self.C1, self.C2, self.ciphertext, self.key_epoch
+            )
+
         return "EncryptedMessage (C1, C2, ciphertext) = ({}, {}, {}))".format(
             self.C1, self.C2, self.ciphertext
         )
 
 
+class MultiRecipientEncryptedMessage(ThresholdDataClass):
+    """
+    A message encrypted for multiple public keys on the same curve. The message is symmetrically encrypted only once
+    and the point rP the symmetric key is derived from is encrypted for each recipient like in EncryptedMessage:
+
+    - recipients, the points Q of the recipient public keys
+    - C1s with C1s[i] = k_i P for recipient i
+    - C2s with C2s[i] = k_i Q_i + rP for recipient i
+    - ciphertext, the symmetrically encrypted message.
+
+    Use for_recipient to get the EncryptedMessage of a recipient, which is used to compute the partial decryptions.
+    """
+
+    __slots__ = ("recipients", "C1s", "C2s", "ciphertext")
+
+    _BINARY_TYPE_ID = 14
+    _FIELDS = (
+        ("recipients", _POINT_LIST),
+        ("C1s", _POINT_LIST),
+        ("C2s", _POINT_LIST),
+        ("ciphertext", _BYTES),
+    )
+
+    def __init__(
+        self,
+        recipients: List[ECC.EccPoint],
+        C1s: List[ECC.EccPoint],
+        C2s: List[ECC.EccPoint],
+        ciphertext: bytes,
+    ):
+        """
+        Construct a multi-recipient encrypted message.
+
+        :param recipients: the points Q of the recipient public keys
+        :param C1s: the values C1 like in EncryptedMessage in the order of the recipients
+        :param C2s: the values C2 like in EncryptedMessage in the order of the recipients
+        :param ciphertext: the symmetrically encrypted message
+        """
+        if not len(recipients) == len(C1s) == len(C2s):
+            raise ThresholdCryptoError(
+                "Numbers of recipients, C1 and C2 values differ: {}, {}, {}".format(
+                    len(recipients), len(C1s), len(C2s)
+                )
+            )
+
+        self.recipients = recipients
+        self.C1s = C1s
+        self.C2s = C2s
+        self.ciphertext = ciphertext
+
+    def for_recipient(self, public_key: PublicKey) -> EncryptedMessage:
+        """
+        Select the encrypted message of a recipient.
+
+        :param public_key: the public key of the recipient
+        :return: the encrypted message decryptable with the key shares of the recipient
+        """
+        for Q, C1, C2 in zip(self.recipients, self.C1s, self.C2s):
+            if Q == public_key.Q:
+                return EncryptedMessage(C1, C2, self.ciphertext)
+
+        raise ThresholdCryptoError("Public key is no recipient of the message")
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, self.__class__)
+            and self.recipients == other.recipients
+            and self.C1s == other.C1s
+            and self.C2s == other.C2s
+            and self.ciphertext == other.ciphertext
+        )
+
+    def __str__(self):
+        return "MultiRecipientEncryptedMessage for {} recipients (C1s, C2s, ciphertext) = ({}, {}, {})".format(
+            len(self.recipients), self.C1s, self.C2s, self.ciphertext
+        )
+
+
 class LagrangeCoefficient(ThresholdDataClass):
     """
     The Lagrange coefficient for a distinct participant used in partial decryption combination and partial re-encryption key combination.
     """
 
+    __slots__ = ("participant_index", "used_index_values", "coefficient")
+
+    _BINARY_TYPE_ID = 6
+    _FIELDS = (
+        ("participant_index", _INT),
+        ("used_index_values", _INT_SET),
+        ("coefficient", _INT),
+    )
+
     def __init__(
         self, participant_index: int, used_index_values: Iterable[int], coefficient: int
     ):
@@ -296,7 +982,8 @@ class LagrangeCoefficient(ThresholdDataClass):
         :param coefficient: the computed Lagrange coefficient for participant_index using used_index_values
         """
         self.participant_index = participant_index
-        self.used_index_values = set(used_index_values)
+        # immutable, so the coefficients of a group can share the same set (frozenset() of a frozenset is a no-op)
+        self.used_index_values = frozenset(used_index_values)
         self.coefficient = coefficient
 
     def __eq__(self, other):
@@ -320,6 +1007,15 @@ class PartialDecryption(ThresholdDataClass):
     A partial decryption of an encrypted message computed by a share owner using his share.
     """
 
+    __slots__ = ("x", "yC1", "curve_params")
+
+    _BINARY_TYPE_ID = 7
+    _FIELDS = (
+        ("x", _INT),
+        ("yC1", _POINT),
+        ("curve_params", _CURVE),
+    )
+
     def __init__(self, x: int, yC1: ECC.EccPoint, curve_params: CurveParameters):
         """
         Construct the partial decryption.
@@ -345,6 +1041,57 @@ class PartialDecryption(ThresholdDataClass):
         )
 
 
+class PartialDecryptionBatch(ThresholdDataClass):
+    """
+    The partial decryptions of many encrypted messages computed by a share owner using his share. The shares x value
+    and the curve parameters are stored once for all messages.
+    """
+
+    __slots__ = ("x", "yC1s", "curve_params")
+
+    _BINARY_TYPE_ID = 15
+    _FIELDS = (
+        ("x", _INT),
+        ("yC1s", _POINT_LIST),
+        ("curve_params", _CURVE),
+    )
+
+    def __init__(self, x: int, yC1s: List[ECC.EccPoint], curve_params: CurveParameters):
+        """
+        Construct the partial decryption batch.
+
+        :param x: the shares x value
+        :param yC1s: the computed partial decryption values in the order of the encrypted messages
+        :param curve_params: the curve parameters
+        """
+        self.x = x
+        self.yC1s = yC1s
+        self.curve_params = curve_params
+
+    def __len__(self) -> int:
+        return len(self.yC1s)
+
+    def __getitem__(self, index: int) -> PartialDecryption:
+        return PartialDecryption(self.x, self.yC1s[index], self.curve_params)
+
+    def __iter__(self) -> Iterator[PartialDecryption]:
+        for yC1 in self.yC1s:
+            yield PartialDecryption(self.x, yC1, self.curve_params)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, self.__class__)
+            and self.x == other.x
+            and self.yC1s == other.yC1s
+            and self.curve_params == other.curve_params
+        )
+
+    def __str__(self):
+        return "PartialDecryptionBatch of {} values for x = {} (on curve {})".format(
+            len(self.yC1s), self.x, self.curve_params._name
+        )
+
+
 # re-encryption data types
 
 
@@ -353,6 +1100,14 @@ class PartialReEncryptionKey(ThresholdDataClass):
     A partial re-encryption key, which can be combined with others to yield the final re-encryption key.
     """
 
+    __slots__ = ("partial_key", "curve_params")
+
+    _BINARY_TYPE_ID = 8
+    _FIELDS = (
+        ("partial_key", _SCALAR),
+        ("curve_params", _CURVE),
+    )
+
     def __init__(self, partial_key: int, curve_params: CurveParameters):
         """
         Construct a partial re-encryption key.
@@ -385,6 +1140,14 @@ class ReEncryptionKey(ThresholdDataClass):
     encrypted for access structure A to ciphertexts decryptable by access structure B.
     """
 
+    __slots__ = ("key", "curve_params")
+
+    _BINARY_TYPE_ID = 9
+    _FIELDS = (
+        ("key", _SCALAR),
+        ("curve_params", _CURVE),
+    )
+
     def __init__(self, key: int, curve_params: CurveParameters):
         """
         Construct the re-encryption key.
@@ -419,6 +1182,14 @@ class DkgClosedCommitment(ThresholdDataClass):
     The closed commitment sent in the first step of Pedersens DKG protocol.
     """
 
+    __slots__ = ("participant_id", "commitment")
+
+    _BINARY_TYPE_ID = 10
+    _FIELDS = (
+        ("participant_id", _INT),
+        ("commitment", _BYTES),
+    )
+
     def __init__(self, participant_id: int, commitment: bytes):
         """
         Initialize the closed commitment.
@@ -447,6 +1218,16 @@ class DkgOpenCommitment(ThresholdDataClass):
     The open commitment of Pedersens DKG protocol sent after each participant has received all closed commitments.
     """
 
+    __slots__ = ("participant_id", "commitment", "h_i", "r")
+
+    _BINARY_TYPE_ID = 11
+    _FIELDS = (
+        ("participant_id", _INT),
+        ("commitment", _BYTES),
+        ("h_i", _POINT),
+        ("r", _BYTES),
+    )
+
     def __init__(
         self, participant_id: int, commitment: bytes, h_i: ECC.EccPoint, r: bytes
     ):
@@ -483,6 +1264,14 @@ class DkgFijValue(ThresholdDataClass):
     The F_ij values used in Pedersens DKG protocol used as check for the later sent s_ij values.
     """
 
+    __slots__ = ("source_participant_id", "F_ij")
+
+    _BINARY_TYPE_ID = 12
+    _FIELDS = (
+        ("source_participant_id", _INT),
+        ("F_ij", _POINT_LIST),
+    )
+
     def __init__(self, source_participant_id: int, F_ij: List[ECC.EccPoint]):
         """
         Initialize the F_ij value.
@@ -511,6 +1300,15 @@ class DkgSijValue(ThresholdDataClass):
     The share of their secret value a participant sents to another participant SECRETLY.
     """
 
+    __slots__ = ("source_participant_id", "target_participant_id", "s_ij")
+
+    _BINARY_TYPE_ID = 13
+    _FIELDS = (
+        ("source_participant_id", _INT),
+        ("target_participant_id", _INT),
+        ("s_ij", _INT),
+    )
+
     def __init__(
         self, source_participant_id: int, target_participant_id: int, s_ij: int
     ):
@@ -537,3 +1335,25 @@ class DkgSijValue(ThresholdDataClass):
         return "DkgSijValue from participant {} to participant {} = {}".format(
             self.source_participant_id, self.target_participant_id, self.s_ij
         )
+
+
+_BINARY_TYPES: Dict[int, type] = {
+    cls._BINARY_TYPE_ID: cls
+    for cls in [
+        ThresholdParameters,
+        CurveParameters,
+        PublicKey,
+        KeyShare,
+        EncryptedMessage,
+        MultiRecipientEncryptedMessage,
+        LagrangeCoefficient,
+        PartialDecryption,
+        PartialDecryptionBatch,
+        PartialReEncryptionKey,
+        ReEncryptionKey,
+        DkgClosedCommitment,
+        DkgOpenCommitment,
+        DkgFijValue,
+        DkgSijValue,
+    ]
+}
@@ -0,0 +1,589 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import nacl.bindings
+from Crypto.Math.Numbers import Integer
+from Crypto.PublicKey import ECC
+from Crypto.Util._raw_api import c_size_t, c_uint8_ptr
+
+
+class GroupBackend:
+    """
+    Baseclass for the implementations of the prime order group all computations of the scheme are performed in.
+
+    Points of all backends provide the subset of the PyCryptodome ECC.EccPoint interface used in this library:
+    the operators +, +=, - (negation), * (with an integer), ==, the coordinates x, y and xy, the curve name
+    as attribute curve and the methods copy, double and is_point_at_infinity.
+    """
+
+    # Whether algorithms composed of many single point additions (precomputed tables, Straus' and Pippenger's
+    # method) are faster than separate scalar multiplications of the backend.
+    precomputation = True
+
+    def __init__(self, name: str, order: int):
+        self.name = name
+        self.order = order
+
+    def generator(self) -> Any:
+        """Create a new instance of the groups generator point."""
+        raise NotImplementedError("Implement generator in subclass")
+
+    def point(self, x: int, y: int) -> Any:
+        """Create a point from its affine coordinates, making sure it is a valid group element."""
+        raise NotImplementedError("Implement point in subclass")
+
+    def point_at_infinity(self) -> Any:
+        """Create a new neutral element of the group."""
+        raise NotImplementedError("Implement point_at_infinity in subclass")
+
+    def copy_point(self, point: Any) -> Any:
+        """Create a copy of a point of this group without converting it to affine coordinates and back."""
+        result = self.point_at_infinity()
+        result += point
+        return result
+
+    def lazy_point(self, x: int, y: int) -> Any:
+        """
+        Create a point from its affine coordinates, deferring the validation and the conversion into the internal
+        representation to the first arithmetic operation (see decode_lazy_points). The base implementation decodes
+        the point right away.
+        """
+        return self.point(x, y)
+
+    @property
+    def scalar_size(self) -> int:
+        """The number of bytes required for integers modulo the group order."""
+        return (self.order.bit_length() + 7) // 8
+
+    def affine_coordinates(self, points: List[Any]) -> List[Tuple[int, int]]:
+        """
+        Compute the affine coordinates of many points of this group at once. Backends can override this to share work
+        between the points, e.g. a single field inversion for all of them.
+
+        :param points: the points
+        :return: the coordinates (x, y) in the order of the points
+        """
+        return [(int(x), int(y)) for x, y in (point.xy for point in points)]
+
+    def encode_point(self, point: Any, compressed: bool = True) -> bytes:
+        """
+        Encode a point of this group as bytes.
+
+        :param point: the point
+        :param compressed: whether to use the compressed encoding (if the group offers one)
+        :return: the encoding
+        """
+        return self.encode_points([point], compressed)[0]
+
+    def encode_points(self, points: List[Any], compressed: bool = True) -> List[bytes]:
+        """
+        Encode many points of this group at once, see encode_point.
+
+        :param points: the points
+        :param compressed: whether to use the compressed encoding (if the group offers one)
+        :return: the encodings in the order of the points
+        """
+        raise NotImplementedError("Implement encode_points in subclass")
+
+    def decode_point(self, data: bytes, offset: int = 0) -> Tuple[Any, int]:
+        """
+        Decode a point encoded by encode_point, making sure it is a valid group element.
+
+        :param data: the bytes containing the encoding
+        :param offset: the position of the encoding in data
+        :return: the point and the position following its encoding
+        """
+        raise NotImplementedError("Implement decode_point in subclass")
+
+    def __str__(self):
+        return "GroupBackend {} of order {}".format(self.name, self.order)
+
+
+class PyCryptodomeBackend(GroupBackend):
+    """
+    The elliptic curves offered by PyCryptodome:
+    https://pycryptodome.readthedocs.io/en/latest/src/public_key/ecc.html
+    """
+
+    def __init__(self, curve_name: str):
+        self._curve = ECC._curves[curve_name]
+        self._Gx = int(self._curve.Gx)
+        self._Gy = int(self._curve.Gy)
+        self._p = int(self._curve.p)
+        self._b = int(self._curve.b) if self._curve.is_weierstrass else None
+        self._p_integer = Integer(self._p)
+        self._sqrt_exponent = Integer((self._p + 1) // 4)
+        self._field_size = (self._curve.modulus_bits + 7) // 8
+        self._infinity_y = 1 if self._curve.is_edwards else 0
+        super().__init__(self._curve.canonical, int(self._curve.order))
+
+    def generator(self) -> ECC.EccPoint:
+        return ECC.EccPoint(x=self._Gx, y=self._Gy, curve=self.name)
+
+    def point(self, x: int, y: int) -> ECC.EccPoint:
+        return ECC.EccPoint(x=x, y=y, curve=self.name)
+
+    def lazy_point(self, x: int, y: int) -> "LazyEccPoint":
+        return LazyEccPoint(x, y, self.name)
+
+    def point_at_infinity(self) -> ECC.EccPoint:
+        return ECC.EccPoint(0, self._infinity_y, self.name)
+
+    def copy_point(self, point: ECC.EccPoint) -> ECC.EccPoint:
+        # EccPoint.set clones the internal representation, which saves creating a point from coordinates first
+        result = ECC.EccPoint.__new__(ECC.EccPoint)
+        result._curve = self._curve
+        result.curve = self.name
+        return result.set(point)
+
+    def affine_coordinates(self, points: List[ECC.EccPoint]) -> List[Tuple[int, int]]:
+        """
+        PyCryptodome does not expose the projective coordinates of its points, so each point still requires a field
+        inversion by its C implementation. But the conversion of the coordinates into Crypto.Math.Numbers.Integer done
+        by EccPoint.xy, which costs more than the inversion itself, is avoided and the buffers are shared.
+        """
+        size = self._field_size
+        x_bytes = bytearray(size)
+        y_bytes = bytearray(size)
+        x_pointer = c_uint8_ptr(x_bytes)
+        y_pointer = c_uint8_ptr(y_bytes)
+        length = c_size_t(size)
+        get_xy = self._curve.rawlib.get_xy
+
+        coordinates = []
+        for point in points:
+            if isinstance(point, LazyEccPoint) and point._coordinates is not None:
+                coordinates.append(point._coordinates)
+                continue
+
+            result = get_xy(x_pointer, y_pointer, length, point._point.get())
+            if result:
+                raise ValueError("Error {} while encoding an EC point".format(result))
+            coordinates.append(
+                (int.from_bytes(x_bytes, "big"), int.from_bytes(y_bytes, "big"))
+            )
+
+        return coordinates
+
+    def encode_points(
+        self, points: List[ECC.EccPoint], compressed: bool = True
+    ) -> List[bytes]:
+        """
+        Encode points as in SEC 1, section 2.3.3: 0x00 for the point at infinity, 0x02 or 0x03 (the parity of y)
+        followed by x for the compressed and 0x04 followed by x and y for the uncompressed encoding.
+        SEC 1 defines point compression for Weierstrass curves only, other curves always use the uncompressed encoding.
+        """
+        size = self._field_size
+        compressed = compressed and self._curve.is_weierstrass
+
+        encodings = []
+        for x, y in self.affine_coordinates(points):
+            # point.is_point_at_infinity would convert the point to affine coordinates a second time
+            if x == 0 and y == self._infinity_y:
+                encodings.append(bytes(1))
+            elif compressed:
+                encodings.append(bytes([2 | (y & 1)]) + x.to_bytes(size, "big"))
+            else:
+                encodings.append(
+                    bytes([4]) + x.to_bytes(size, "big") + y.to_bytes(size, "big")
+                )
+
+        return encodings
+
+    def decode_point(self, data: bytes, offset: int = 0) -> Tuple[ECC.EccPoint, int]:
+        """
+        Decode a point encoded by encode_point. Decompressing a point requires a modular square root, which makes
+        decoding the compressed encoding considerably slower than decoding the uncompressed one.
+        """
+        if offset >= len(data):
+            raise ValueError("Truncated point encoding")
+
+        prefix = data[offset]
+        size = self._field_size
+        if prefix == 0:
+            return self.point_at_infinity(), offset + 1
+        elif prefix == 4:
+            end = offset + 1 + 2 * size
+            if end > len(data):
+                raise ValueError("Truncated point encoding")
+            x = int.from_bytes(data[offset + 1 : offset + 1 + size], "big")
+            y = int.from_bytes(data[offset + 1 + size : end], "big")
+            return self.point(x, y), end
+        elif prefix in (2, 3) and self._curve.is_weierstrass:
+            end = offset + 1 + size
+            if end > len(data):
+                raise ValueError("Truncated point encoding")
+            x = int.from_bytes(data[offset + 1 : end], "big")
+            return self.point(x, self._recover_y(x, prefix & 1)), end
+        else:
+            raise ValueError("Invalid point encoding")
+
+    def _recover_y(self, x: int, y_parity: int) -> int:
+        # y^2 = x^3 - 3x + b, all Weierstrass curves of PyCryptodome are NIST curves with a = -3
+        p = self._p
+        if x >= p:
+            raise ValueError("Incorrect coordinate length")
+
+        rhs = (x * x * x - 3 * x + self._b) % p
+        # the modular exponentiation of GMP is considerably faster than the builtin pow
+        if p % 4 == 3:
+            y = int(Integer(rhs).inplace_pow(self._sqrt_exponent, self._p_integer))
+        else:
+            y = int(Integer(rhs).sqrt(self._p_integer))
+        if y * y % p != rhs:
+            raise ValueError("The EC point does not belong to the curve")
+
+        if y & 1 != y_parity:
+            if y == 0:
+                raise ValueError("Invalid point encoding")
+            y = p - y
+
+        return y
+
+
+class LazyEccPoint(ECC.EccPoint):
+    """
+    An EccPoint given by affine coordinates, which are validated and converted into the internal representation of
+    PyCryptodome on first use only (by EccPoint.__init__, called from __getattr__). Until then, and as long as the
+    point is not modified in place, its coordinates are available without any curve arithmetic.
+    """
+
+    def __init__(self, x: int, y: int, curve_name: str):
+        self.curve = curve_name
+        self._coordinates: Optional[Tuple[int, int]] = (x, y)
+
+    def __getattr__(self, name):
+        # _curve and _point are missing until EccPoint.__init__ has been called
+        if name in ("_curve", "_point") and self.__dict__.get("_coordinates"):
+            self.decode()
+            return self.__dict__[name]
+
+        raise AttributeError(name)
+
+    def decode(self) -> "LazyEccPoint":
+        """Validate the point and convert it into the internal representation, if not done yet."""
+        if "_point" not in self.__dict__:
+            try:
+                ECC.EccPoint.__init__(self, *self._coordinates, self.curve)
+            except ValueError:
+                # do not leave a partially initialized point behind
+                self.__dict__.pop("_point", None)
+                self.__dict__.pop("_curve", None)
+                raise
+
+        return self
+
+    @property
+    def xy(self):
+        if self._coordinates is not None:
+            return self._coordinates
+        return ECC.EccPoint.xy.fget(self)
+
+    def _modify(self):
+        # the stored coordinates become invalid when the point is modified in place
+        self.decode()
+        self._coordinates = None
+
+    def set(self, point):
+        self._modify()
+        return super().set(point)
+
+    def double(self):
+        self._modify()
+        return super().double()
+
+    def __iadd__(self, point):
+        self._modify()
+        return super().__iadd__(point)
+
+    def __imul__(self, scalar):
+        self._modify()
+        return super().__imul__(scalar)
+
+
+# Ed25519 via libsodium
+
+LIBSODIUM_ED25519 = "Ed25519/libsodium"
+
+_ED25519_P = 2**255 - 19
+_ED25519_D = -121665 * pow(121666, _ED25519_P - 2, _ED25519_P) % _ED25519_P
+_ED25519_SQRT_M1 = pow(2, (_ED25519_P - 1) // 4, _ED25519_P)
+_ED25519_ORDER = 2**252 + 27742317777372353535851937790883648493
+_ED25519_IDENTITY = bytes([1]) + bytes(31)
+
+
+class Ed25519Point:
+    """
+    A point of the prime order subgroup of Ed25519, represented by its 32 byte encoding.
+    All arithmetic is performed by libsodium.
+    """
+
+    curve = LIBSODIUM_ED25519
+
+    def __init__(self, encoded: bytes):
+        """
+        Construct the point from its encoding. The encoding is not validated, use LibsodiumEd25519Backend.point
+        for untrusted input.
+
+        :param encoded: the 32 byte encoding as used by libsodium
+        """
+        self._encoded = encoded
+
+    @property
+    def encoded(self) -> bytes:
+        return self._encoded
+
+    @property
+    def xy(self) -> (int, int):
+        y = int.from_bytes(self._encoded, "little") & ((1 << 255) - 1)
+        x_sign = self._encoded[31] >> 7
+        return _ed25519_recover_x(y, x_sign), y
+
+    @property
+    def x(self) -> int:
+        return self.xy[0]
+
+    @property
+    def y(self) -> int:
+        return self.xy[1]
+
+    def copy(self) -> "Ed25519Point":
+        return Ed25519Point(self._encoded)
+
+    def is_point_at_infinity(self) -> bool:
+        return self._encoded == _ED25519_IDENTITY
+
+    def double(self) -> "Ed25519Point":
+        self._encoded = nacl.bindings.crypto_core_ed25519_add(
+            self._encoded, self._encoded
+        )
+        return self
+
+    def __iadd__(self, point: "Ed25519Point") -> "Ed25519Point":
+        self._encoded = nacl.bindings.crypto_core_ed25519_add(
+            self._encoded, point._encoded
+        )
+        return self
+
+    def __add__(self, point: "Ed25519Point") -> "Ed25519Point":
+        return Ed25519Point(
+            nacl.bindings.crypto_core_ed25519_add(self._encoded, point._encoded)
+        )
+
+    def __neg__(self) -> "Ed25519Point":
+        return Ed25519Point(
+            nacl.bindings.crypto_core_ed25519_sub(_ED25519_IDENTITY, self._encoded)
+        )
+
+    def __mul__(self, scalar: int) -> "Ed25519Point":
+        if scalar < 0:
+            raise ValueError(
+                "Scalar multiplication is only defined for non-negative integers"
+            )
+
+        # libsodium refuses the neutral element as input and output
+        k = scalar % _ED25519_ORDER
+        if k == 0 or self.is_point_at_infinity():
+            return Ed25519Point(_ED25519_IDENTITY)
+
+        k_bytes = k.to_bytes(32, "little")
+        if self._encoded == _ED25519_BASE:
+            return Ed25519Point(
+                nacl.bindings.crypto_scalarmult_ed25519_base_noclamp(k_bytes)
+            )
+        else:
+            return Ed25519Point(
+                nacl.bindings.crypto_scalarmult_ed25519_noclamp(k_bytes, self._encoded)
+            )
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return isinstance(other, Ed25519Point) and self._encoded == other._encoded
+
+    def __str__(self):
+        return "Ed25519Point({})".format(self._encoded.hex())
+
+    __repr__ = __str__
+
+
+class LazyEd25519Point(Ed25519Point):
+    """
+    An Ed25519Point given by affine coordinates, which are validated and encoded on first use only.
+    """
+
+    def __init__(self, x: int, y: int):
+        self._coordinates: Optional[Tuple[int, int]] = (x, y)
+
+    def __getattr__(self, name):
+        # _encoded is missing until the point has been decoded
+        if name == "_encoded" and self.__dict__.get("_coordinates"):
+            self.decode()
+            return self.__dict__[name]
+
+        raise AttributeError(name)
+
+    def decode(self) -> "LazyEd25519Point":
+        """Validate the point and compute its encoding, if not done yet."""
+        if "_encoded" not in self.__dict__:
+            self._encoded = _LIBSODIUM_ED25519_BACKEND.point(*self._coordinates).encoded
+
+        return self
+
+    @property
+    def xy(self) -> (int, int):
+        if self._coordinates is not None:
+            return self._coordinates
+        return super().xy
+
+    def double(self) -> "Ed25519Point":
+        self.decode()
+        self._coordinates = None
+        return super().double()
+
+    def __iadd__(self, point: "Ed25519Point") -> "Ed25519Point":
+        self.decode()
+        self._coordinates = None
+        return super().__iadd__(point)
+
+
+def _ed25519_recover_x(y: int, x_sign: int) -> int:
+    # x^2 = (y^2 - 1) / (d * y^2 + 1), see RFC 8032, section 5.1.3
+    p = _ED25519_P
+    u = (y * y - 1) % p
+    v = (_ED25519_D * y * y + 1) % p
+    x = u * pow(v, 3, p) * pow(u * pow(v, 7, p), (p - 5) // 8, p) % p
+    if (v * x * x - u) % p != 0:
+        x = x * _ED25519_SQRT_M1 % p
+    if x & 1 != x_sign:
+        x = p - x
+
+    return x % p
+
+
+_ED25519_BASE = nacl.bindings.crypto_scalarmult_ed25519_base_noclamp(
+    (1).to_bytes(32, "little")
+)
+
+
+class LibsodiumEd25519Backend(GroupBackend):
+    """
+    The prime order subgroup of the twisted Edwards curve Ed25519 with arithmetic performed by libsodium.
+    """
+
+    precomputation = False
+
+    def __init__(self):
+        super().__init__(LIBSODIUM_ED25519, _ED25519_ORDER)
+
+    def generator(self) -> Ed25519Point:
+        return Ed25519Point(_ED25519_BASE)
+
+    def point(self, x: int, y: int) -> Ed25519Point:
+        p = _ED25519_P
+        if not (0 <= x < p and 0 <= y < p):
+            raise ValueError("Incorrect coordinate length")
+
+        if (y * y - x * x - 1 - _ED25519_D * x * x * y * y) % p != 0:
+            raise ValueError("The EC point does not belong to the curve")
+
+        encoded = (y | ((x & 1) << 255)).to_bytes(32, "little")
+
+        # libsodium accepts only points of the prime order subgroup except the neutral element
+        if encoded != _ED25519_IDENTITY and not (
+            nacl.bindings.crypto_core_ed25519_is_valid_point(encoded)
+        ):
+            raise ValueError("The EC point does not belong to the prime order subgroup")
+
+        return Ed25519Point(encoded)
+
+    def point_at_infinity(self) -> Ed25519Point:
+        return Ed25519Point(_ED25519_IDENTITY)
+
+    def copy_point(self, point: Ed25519Point) -> Ed25519Point:
+        return point.copy()
+
+    def lazy_point(self, x: int, y: int) -> LazyEd25519Point:
+        return LazyEd25519Point(x, y)
+
+    def encode_points(
+        self, points: List[Ed25519Point], compressed: bool = True
+    ) -> List[bytes]:
+        """The 32 byte encodings of libsodium, which are compressed already."""
+        return [point.encoded for point in points]
+
+    def decode_point(self, data: bytes, offset: int = 0) -> Tuple[Ed25519Point, int]:
+        end = offset + 32
+        if end > len(data):
+            raise ValueError("Truncated point encoding")
+
+        encoded = bytes(data[offset:end])
+        if encoded != _ED25519_IDENTITY and not (
+            nacl.bindings.crypto_core_ed25519_is_valid_point(encoded)
+        ):
+            raise ValueError("The EC point does not belong to the prime order subgroup")
+
+        return Ed25519Point(encoded), end
+
+
+_LIBSODIUM_ED25519_BACKEND = LibsodiumEd25519Backend()
+
+_backends: Dict[str, GroupBackend] = {LIBSODIUM_ED25519: _LIBSODIUM_ED25519_BACKEND}
+
+
+def get_backend(curve_name: str) -> GroupBackend:
+    """
+    Return the backend for a curve name. Names of PyCryptodome curves are resolved to the shared backend of the
+    curve, so that aliases (e.g. "P-256" and "secp256r1") yield the same backend.
+
+    :param curve_name: the curve name
+    :return: the backend
+    """
+    backend = _backends.get(curve_name)
+    if backend is None:
+        if curve_name not in ECC._curves:
+            raise ValueError("Unsupported curve: " + curve_name)
+
+        curve = ECC._curves[curve_name]
+        # Montgomery curves (Curve25519, Curve448) lack the y coordinate the point arithmetic requires
+        if not (curve.is_weierstrass or curve.is_edwards):
+            raise ValueError("Unsupported curve: " + curve_name)
+
+        canonical_name = curve.canonical
+        backend = _backends.get(canonical_name)
+        if backend is None:
+            backend = PyCryptodomeBackend(canonical_name)
+            _backends[canonical_name] = backend
+
+        _backends[curve_name] = backend
+
+    return backend
+
+
+def decode_lazy_points(points: Iterable[Any]):
+    """
+    Validate and decode all lazily created points among the given points at once (see GroupBackend.lazy_point).
+
+    :param points: the points
+    :raises ValueError: for points not being valid group elements
+    """
+    for point in points:
+        if isinstance(point, (LazyEccPoint, LazyEd25519Point)):
+            point.decode()
+
+
+def affine_coordinates(points: List[Any]) -> List[Tuple[int, int]]:
+    """
+    Compute the affine coordinates of many points of the same group at once, see GroupBackend.affine_coordinates.
+
+    :param points: the points
+    :return: the coordinates (x, y) in the order of the points
+    """
+    if len(points) == 0:
+        return []
+
+    return get_backend(points[0].curve).affine_coordinates(points)
+
+
+def is_point(value: Any) -> bool:
+    """Check whether a value is a point of one of the backends."""
+    return isinstance(value, (ECC.EccPoint, Ed25519Point))
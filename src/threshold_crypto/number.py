@@ -1,10 +1,12 @@
 import functools
 import operator
-from typing import List, Optional
+from typing import Iterable, List, Optional
 
 from Crypto.PublicKey import ECC
 from Crypto.Random import random
 
+from threshold_crypto import group
+
 
 def int_to_bytes(value: int) -> bytes:
     """Return the bytes for a given integer."""
@@ -16,15 +18,149 @@ def ecc_sum(points: List[ECC.EccPoint]) -> Optional[ECC.EccPoint]:
     if len(points) == 0:
         return None
     elif len(points) == 1:
-        return points[0].copy()
+        return ecc_copy(points[0])
     else:
-        result = points[0].copy()
+        result = ecc_copy(points[0])
         for point in points[1:]:
             result += point
 
         return result
 
 
+def ecc_point_at_infinity(curve_name: str) -> ECC.EccPoint:
+    """Create a new point at infinity (the neutral element) on the given curve."""
+    return group.get_backend(curve_name).point_at_infinity()
+
+
+def ecc_copy(point: ECC.EccPoint) -> ECC.EccPoint:
+    """
+    Copy an EccPoint. Unlike EccPoint.copy this does not convert the point to affine coordinates and back, which
+    makes it considerably faster.
+    """
+    return group.get_backend(point.curve).copy_point(point)
+
+
+def ecc_mul(point: ECC.EccPoint, scalar: int) -> ECC.EccPoint:
+    """
+    Compute scalar * point as a new point. Unlike EccPoint.__mul__ this copies the point without converting it to
+    affine coordinates and back before the multiplication.
+    """
+    backend = group.get_backend(point.curve)
+    if not backend.precomputation:
+        # the multiplication of these backends creates the new point directly
+        return point * scalar
+
+    result = backend.copy_point(point)
+    result *= scalar
+    return result
+
+
+# Below this number of points Straus' method is faster than Pippenger's bucket method
+_PIPPENGER_THRESHOLD = 64
+
+
+def multi_scalar_mul(
+    scalars: List[int], points: List[ECC.EccPoint]
+) -> Optional[ECC.EccPoint]:
+    """
+    Compute the sum of scalars[i] * points[i] at once, which is considerably faster than separate scalar
+    multiplications. Straus' interleaved window method is used for few points, Pippenger's bucket method for many.
+
+    :param scalars: non-negative scalars (reduce them modulo the group order beforehand to save work)
+    :param points: the points, all on the same curve
+    :return: the resulting point or None for empty lists
+    """
+    if len(scalars) != len(points):
+        raise ValueError(
+            "Number of scalars {} != {} = number of points".format(
+                len(scalars), len(points)
+            )
+        )
+
+    if len(points) == 0:
+        return None
+
+    if any(k < 0 for k in scalars):
+        raise ValueError("Scalars must be non-negative")
+
+    if not group.get_backend(points[0].curve).precomputation:
+        return ecc_sum([k * point for k, point in zip(scalars, points)])
+
+    if len(points) < _PIPPENGER_THRESHOLD:
+        return _straus(scalars, points, window=4 if len(points) < 8 else 3)
+    else:
+        return _pippenger(scalars, points, window=max(4, len(points).bit_length() - 4))
+
+
+def _straus(
+    scalars: List[int], points: List[ECC.EccPoint], window: int
+) -> ECC.EccPoint:
+    mask = (1 << window) - 1
+
+    # tables[i][d] = d * points[i]
+    tables = []
+    for point in points:
+        table = [None, point]
+        acc = ecc_copy(point)
+        for _ in range(2, 1 << window):
+            acc += point
+            table.append(ecc_copy(acc))
+        tables.append(table)
+
+    result = ecc_point_at_infinity(points[0].curve)
+    windows = (max(k.bit_length() for k in scalars) + window - 1) // window
+
+    for j in reversed(range(0, windows)):
+        for _ in range(0, window):
+            result.double()
+
+        shift = j * window
+        for k, table in zip(scalars, tables):
+            digit = (k >> shift) & mask
+            if digit:
+                result += table[digit]
+
+    return result
+
+
+def _pippenger(
+    scalars: List[int], points: List[ECC.EccPoint], window: int
+) -> ECC.EccPoint:
+    mask = (1 << window) - 1
+    curve_name = points[0].curve
+
+    result = ecc_point_at_infinity(curve_name)
+    windows = (max(k.bit_length() for k in scalars) + window - 1) // window
+
+    for j in reversed(range(0, windows)):
+        for _ in range(0, window):
+            result.double()
+
+        # sort the points into buckets by their digit in this window
+        shift = j * window
+        buckets: List[Optional[ECC.EccPoint]] = [None] * (mask + 1)
+        for k, point in zip(scalars, points):
+            digit = (k >> shift) & mask
+            if digit:
+                bucket = buckets[digit]
+                if bucket is None:
+                    buckets[digit] = ecc_copy(point)
+                else:
+                    bucket += point
+
+        # sum of d * buckets[d] via running sums
+        running = ecc_point_at_infinity(curve_name)
+        window_sum = ecc_point_at_infinity(curve_name)
+        for digit in range(mask, 0, -1):
+            if buckets[digit] is not None:
+                running += buckets[digit]
+            window_sum += running
+
+        result += window_sum
+
+    return result
+
+
 def random_in_range(a: int, b: int) -> int:
     """Return a random number r with a <= r <= b."""
     return random.randint(a, b)
@@ -35,6 +171,31 @@ def prime_mod_inv(x: int, p: int) -> int:
     return pow(x, p - 2, p)  # Fermats little theorem
 
 
+def batch_mod_inv(values: List[int], p: int) -> List[int]:
+    """
+    Compute the modular inverses of all values in the finite field Z_p with a single inversion (Montgomery's trick).
+
+    :param values: the values, none of them 0 mod p
+    :param p: the prime modulus
+    :return: the inverses in the order of the values
+    """
+    # prefix_products[i] = values[0] * ... * values[i - 1]
+    prefix_products = [1]
+    for value in values:
+        prefix_products.append(prefix_products[-1] * value % p)
+
+    inv = prime_mod_inv(prefix_products[-1], p)
+    if inv == 0:
+        raise ValueError("0 has no modular inverse")
+
+    inverses = [0] * len(values)
+    for i in reversed(range(0, len(values))):
+        inverses[i] = inv * prefix_products[i] % p
+        inv = inv * values[i] % p
+
+    return inverses
+
+
 def prod(factors: List[int]) -> int:
     """Compute the product of a list of integers."""
     return functools.reduce(operator.mul, factors, 1)
@@ -71,16 +232,104 @@ class PolynomMod:
 
     def evaluate(self, x: int) -> int:
         """
-        Evaluate the polynomial for a given x value.
+        Evaluate the polynomial for a given x value using Horner's method.
 
         :param x: the value
         :return: the result
         """
-        evaluated = (
-            (self.coefficients[j] * pow(x, j)) for j in range(0, self.degree + 1)
-        )
-        return sum(evaluated) % self.q
+        q = self.q
+        x %= q
+        result = 0
+        for coefficient in reversed(self.coefficients):
+            result = (result * x + coefficient) % q
+
+        return result
+
+    def evaluate_many(self, xs: Iterable[int]) -> List[int]:
+        """
+        Evaluate the polynomial for multiple x values. Horner's method is applied to all values at once, so the loop
+        over the coefficients is shared by all values.
+
+        :param xs: the values
+        :return: the results in the order of the values
+        """
+        q = self.q
+        xs = [x % q for x in xs]
+        results = [0] * len(xs)
+        for coefficient in reversed(self.coefficients):
+            results = [(r * x + coefficient) % q for r, x in zip(results, xs)]
+
+        return results
 
     def __str__(self) -> str:
         c_list = ["%d*x^%d " % (c, i) for (i, c) in enumerate(self.coefficients)]
         return "Polynom of degree {}: f(x) = {}".format(self.degree, " + ".join(c_list))
+
+
+class FixedBaseTable:
+    """
+    Precomputed multiples of a fixed point for fast scalar multiplications with this point (fixed-base windowing).
+
+    For a window width w the table holds d * 2^(w*i) * P for all digits d in [1, 2^w - 1] and all windows i.
+    Computing k * P then requires just one in-place point addition per base-2^w digit of k and no doublings.
+
+    Every window performs exactly one point addition (for zero digits of a dummy point to a dummy accumulator), so the
+    number of point operations does not depend on the scalar. This is not a constant time implementation: the
+    digits still select table entries and accumulators, and the point arithmetic itself is not constant time.
+    """
+
+    DEFAULT_WINDOW = 8
+
+    def __init__(self, point: ECC.EccPoint, order: int, window: int = DEFAULT_WINDOW):
+        """
+        Precompute the table for a point.
+
+        :param point: the fixed point
+        :param order: the order of the point (scalars are reduced modulo this value)
+        :param window: the window width w in bits, the table contains ceil(log2(order) / w) * (2^w - 1) points
+        """
+        self.order = order
+        self.window = window
+        self._curve_name = point.curve
+        self._rows: List[List[ECC.EccPoint]] = []
+
+        base = ecc_copy(point)
+        for _ in range(0, (order.bit_length() + window - 1) // window):
+            # row[0] is the dummy point added for zero digits
+            row = [ecc_copy(base)]
+            acc = ecc_point_at_infinity(self._curve_name)
+            for _ in range(1, 1 << window):
+                acc += base
+                row.append(ecc_copy(acc))
+            self._rows.append(row)
+
+            for _ in range(0, window):
+                base.double()
+
+    @property
+    def size(self) -> int:
+        """The number of precomputed points."""
+        return sum(len(row) - 1 for row in self._rows)
+
+    def multiply(self, scalar: int) -> ECC.EccPoint:
+        """
+        Compute scalar * P for the fixed point P of this table.
+
+        :param scalar: the scalar
+        :return: a new point
+        """
+        k = scalar % self.order
+        mask = (1 << self.window) - 1
+        # (result, dummy accumulator), zero digits add to the dummy so that every window does one addition
+        accumulators = (
+            ecc_point_at_infinity(self._curve_name),
+            ecc_point_at_infinity(self._curve_name),
+        )
+
+        for row in self._rows:
+            digit = k & mask
+            accumulator = accumulators[digit == 0]
+            accumulator += row[digit]
+            k >>= self.window
+
+        return accumulators[0]
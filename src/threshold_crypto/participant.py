@@ -1,4 +1,5 @@
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
 
 from Crypto.PublicKey import ECC
 from Crypto.Random import random
@@ -8,6 +9,7 @@ from threshold_crypto.data import (
     EncryptedMessage,
     KeyShare,
     PartialDecryption,
+    PartialDecryptionBatch,
     PartialReEncryptionKey,
     ThresholdCryptoError,
     CurveParameters,
@@ -19,7 +21,7 @@ from threshold_crypto.data import (
     DkgFijValue,
     PublicKey,
 )
-from threshold_crypto import number
+from threshold_crypto import group, number
 
 
 ParticipantId = int
@@ -35,11 +37,94 @@ def compute_partial_decryption(
     :param key_share: the key share
     :return: a partial decryption
     """
-    yC1 = encrypted_message.C1 * key_share.y
+    try:
+        yC1 = number.ecc_mul(encrypted_message.C1, key_share.y)
+    except ValueError as e:
+        # invalid point of a lazily decoded message
+        raise ThresholdCryptoError("Invalid point C1: {}".format(e))
 
     return PartialDecryption(key_share.x, yC1, key_share.curve_params)
 
 
+def compute_partial_decryptions(
+    encrypted_messages: Iterable[EncryptedMessage],
+    key_share: KeyShare,
+    workers: int = 1,
+    chunk_size: int = 256,
+) -> PartialDecryptionBatch:
+    """
+    Compute the partial decryptions of many encrypted messages using a key share, see compute_partial_decryption.
+    Optionally the messages are distributed in chunks over a pool of worker processes. Note that with workers > 1
+    the secret value of the key share is copied into each of the child processes.
+
+    :param encrypted_messages: the encrypted messages
+    :param key_share: the key share
+    :param workers: the number of worker processes (1 computes the partial decryptions in this process)
+    :param chunk_size: the number of messages sent to a worker at once
+    :return: the partial decryptions in the order of the encrypted messages
+    """
+    C1s = [em.C1 for em in encrypted_messages]
+
+    try:
+        yC1s = _partial_decryption_points(C1s, key_share, workers, chunk_size)
+    except ValueError as e:
+        # invalid points of lazily decoded messages
+        raise ThresholdCryptoError("Invalid point C1: {}".format(e))
+
+    return PartialDecryptionBatch(key_share.x, yC1s, key_share.curve_params)
+
+
+def _partial_decryption_points(
+    C1s: List[ECC.EccPoint], key_share: KeyShare, workers: int, chunk_size: int
+) -> List[ECC.EccPoint]:
+    if workers <= 1 or len(C1s) <= chunk_size:
+        return [number.ecc_mul(C1, key_share.y) for C1 in C1s]
+    else:
+        # points can not be pickled, so they are passed between processes in the encoding of the backend,
+        # uncompressed to spare the modular square roots of decompression (Ed25519 points are always compressed,
+        # but encoded without computing their affine coordinates)
+        backend = key_share.curve_params.backend
+        encodings = backend.encode_points(C1s, compressed=False)
+
+        # the workers receive the curve and the secret scalar only, not the serialized key share
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_partial_decryption_worker,
+            initargs=(backend.name, key_share.y),
+        ) as executor:
+            chunks = executor.map(
+                _partial_decryption_chunk,
+                [
+                    encodings[i : i + chunk_size]
+                    for i in range(0, len(encodings), chunk_size)
+                ],
+            )
+            return [
+                backend.decode_point(encoding)[0]
+                for chunk in chunks
+                for encoding in chunk
+            ]
+
+
+_worker_backend: Optional[group.GroupBackend] = None
+_worker_key_share_y: Optional[int] = None
+
+
+def _init_partial_decryption_worker(backend_name: str, key_share_y: int):
+    global _worker_backend, _worker_key_share_y
+    _worker_backend = group.get_backend(backend_name)
+    _worker_key_share_y = key_share_y
+
+
+def _partial_decryption_chunk(encodings: List[bytes]) -> List[bytes]:
+    points = [_worker_backend.decode_point(encoding)[0] for encoding in encodings]
+
+    return _worker_backend.encode_points(
+        [number.ecc_mul(point, _worker_key_share_y) for point in points],
+        compressed=False,
+    )
+
+
 def compute_partial_re_encryption_key(
     old_share: KeyShare,
     old_lc: LagrangeCoefficient,
@@ -87,6 +172,7 @@ class Participant:
     """
 
     _COMMITMENT_RANDOM_BITS = 256
+    _BATCH_VERIFICATION_RANDOM_BITS = 128
 
     def __init__(
         self,
@@ -94,6 +180,7 @@ class Participant:
         all_participant_ids: List[ParticipantId],
         curve_params: CurveParameters,
         threshold_params: ThresholdParameters,
+        defer_sij_verification: bool = False,
     ):
         """
         Initialize a participant.
@@ -103,6 +190,8 @@ class Participant:
         :param all_participant_ids: a list of all
         :param curve_params: the curve parameters used
         :param threshold_params: the required threshold parameters
+        :param defer_sij_verification: if set, received s_ij values are not verified on receipt but all at once in
+        verify_all_sij, which is considerably faster for many participants
         """
         if len(set(all_participant_ids)) != threshold_params.n:
             raise ThresholdCryptoError(
@@ -122,7 +211,7 @@ class Participant:
         self.threshold_params: ThresholdParameters = threshold_params
 
         self._x_i: int = number.random_in_range(0, curve_params.order)
-        self._h_i: ECC.EccPoint = self._x_i * curve_params.P
+        self._h_i: ECC.EccPoint = curve_params.mul_base(self._x_i)
         self._polynom: number.PolynomMod = number.PolynomMod.create_random_polynom(
             self._x_i, self.threshold_params.t - 1, curve_params.order
         )
@@ -130,13 +219,15 @@ class Participant:
         # calculate own F_ij values
         self._local_F_ij: List[ECC.EccPoint] = []
         for coeff in self._polynom.coefficients:
-            self._local_F_ij.append(coeff * curve_params.P)
+            self._local_F_ij.append(curve_params.mul_base(coeff))
 
         # calculate own s_ij values
-        self._local_sij: Dict[ParticipantId, int] = {}
-        for p_id in self.all_participant_ids:
-            s_ij = self._polynom.evaluate(p_id)
-            self._local_sij[p_id] = s_ij
+        self._local_sij: Dict[ParticipantId, int] = dict(
+            zip(
+                self.all_participant_ids,
+                self._polynom.evaluate_many(self.all_participant_ids),
+            )
+        )
 
         # random value for commitment of h_i
         rand_int = random.getrandbits(self._COMMITMENT_RANDOM_BITS)
@@ -158,14 +249,18 @@ class Participant:
             self.id: self._unchecked_s_ij_value_for_participant(self.id)
         }
 
+        self._defer_sij_verification: bool = defer_sij_verification
+        self._unverified_sij: List[ParticipantId] = []
+
         self._s_i: Optional[int] = None
         self.key_share: Optional[KeyShare] = None
 
     @staticmethod
     def _compute_commitment(commitment_random: bytes, h_i: ECC.EccPoint):
+        x, y = group.affine_coordinates([h_i])[0]
         hash_fct = SHA3_256.new(commitment_random)
-        hash_fct.update(number.int_to_bytes(int(h_i.x)))
-        hash_fct.update(number.int_to_bytes(int(h_i.y)))
+        hash_fct.update(number.int_to_bytes(x))
+        hash_fct.update(number.int_to_bytes(y))
         return hash_fct.digest()
 
     def closed_commitment(self) -> DkgClosedCommitment:
@@ -393,19 +488,75 @@ class Participant:
                 "s_ij value for participant {} already received".format(source_id)
             )
 
-        # verify received F values
-        s_ijP = sij * self.curve_params.P
-        F_list = [
-            (self.id**l) * F_jl
-            for l, F_jl in enumerate(self._received_F[source_id].F_ij)
-        ]
-        F_sum = number.ecc_sum(F_list)
-
-        if s_ijP != F_sum:
+        if self._defer_sij_verification:
+            self._unverified_sij.append(source_id)
+        elif not self._verify_sij(source_id):
             raise ThresholdCryptoError(
                 "F verification failed for participant {}".format(source_id)
             )
 
+    def _verify_sij(self, source_id: ParticipantId) -> bool:
+        # verify received s_ij value against the F values: s_ij * P =?= sum(id^l * F_jl)
+        s_ijP = self.curve_params.mul_base(self._received_sij[source_id].s_ij)
+        F_ij = self._received_F[source_id].F_ij
+        F_sum = number.multi_scalar_mul(self._id_powers(len(F_ij)), F_ij)
+
+        return s_ijP == F_sum
+
+    def _id_powers(self, count: int) -> List[int]:
+        q = self.curve_params.order
+        powers = [1]
+        for _ in range(1, count):
+            powers.append(powers[-1] * self.id % q)
+
+        return powers
+
+    def verify_all_sij(self):
+        """
+        Verify all s_ij values received since the last verification (just relevant if s_ij verification is deferred).
+
+        All values are checked at once by testing a random linear combination of the single checks
+        sum(r_j * s_ij * P) =?= sum(r_j * id^l * F_jl) with one multi-scalar multiplication.
+        A dishonest participant passes this check only with negligible probability. If the check fails, the values
+        are verified one by one to determine the dishonest participants.
+        """
+        if not self._unverified_sij:
+            return
+
+        q = self.curve_params.order
+        id_powers = self._id_powers(self.threshold_params.t)
+
+        s_sum = 0
+        scalars = []
+        points = []
+        for source_id in self._unverified_sij:
+            r_j = random.getrandbits(self._BATCH_VERIFICATION_RANDOM_BITS)
+            s_sum += r_j * self._received_sij[source_id].s_ij
+            # the cost of the multi-scalar multiplication grows with the scalars' bit length,
+            # so the products are just reduced if necessary
+            scalars.extend(
+                r_j * power if r_j * power < q else r_j * power % q
+                for power in id_powers
+            )
+            points.extend(self._received_F[source_id].F_ij)
+
+        if self.curve_params.mul_base(s_sum) == number.multi_scalar_mul(
+            scalars, points
+        ):
+            self._unverified_sij = []
+            return
+
+        invalid_ids = [
+            source_id
+            for source_id in self._unverified_sij
+            if not self._verify_sij(source_id)
+        ]
+        self._unverified_sij = invalid_ids
+
+        raise ThresholdCryptoError(
+            "F verification failed for participants {}".format(invalid_ids)
+        )
+
     def compute_share(self) -> KeyShare:
         """
         Compute the participants key share from values obtained during the DKG protocol.
@@ -419,6 +570,8 @@ class Participant:
                 )
             )
 
+        self.verify_all_sij()
+
         self._s_i = (
             sum(rs.s_ij for rs in self._received_sij.values()) % self.curve_params.order
         )
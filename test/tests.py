@@ -1,5 +1,13 @@
+import array
+import copy
+import io
+import mmap
+import os
+import pickle
+import tempfile
 import unittest
 
+import nacl.secret
 from Crypto.Random import random
 
 from threshold_crypto.data import (
@@ -8,7 +16,9 @@ from threshold_crypto.data import (
     ThresholdCryptoError,
     KeyShare,
     EncryptedMessage,
+    MultiRecipientEncryptedMessage,
     PartialDecryption,
+    PartialDecryptionBatch,
     PartialReEncryptionKey,
     ReEncryptionKey,
     PublicKey,
@@ -16,7 +26,12 @@ from threshold_crypto.data import (
     DkgSijValue,
     DkgClosedCommitment,
     DkgFijValue,
+    LagrangeCoefficient,
+    ThresholdDataClass,
+    sequence_to_bytes,
+    sequence_from_bytes,
 )
+from threshold_crypto import group
 from threshold_crypto import number
 from threshold_crypto import central
 from threshold_crypto import participant
@@ -64,22 +79,123 @@ class TCTestCase(unittest.TestCase):
         with self.assertRaises(ThresholdCryptoError):
             CurveParameters(curve_name="invalid-curve")
 
+        for curve_name in ["Curve25519", "X25519", "Curve448", "X448"]:
+            with self.assertRaises(ThresholdCryptoError):
+                CurveParameters(curve_name=curve_name)
+
     def test_curve_parameter_json(self):
         cp = CurveParameters()
         cp_j = CurveParameters.from_json(cp.to_json())
 
         self.assertEqual(cp, cp_j)
 
+    def test_curve_parameters_shared(self):
+        cp = CurveParameters("P-256")
+
+        self.assertIs(cp, CurveParameters())
+        self.assertIs(CurveParameters.from_json(cp.to_json()), cp)
+        self.assertIs(KeyShare.from_json(self.shares[0].to_json()).curve_params, cp)
+        self.assertIs(copy.deepcopy(cp), cp)
+        self.assertIs(pickle.loads(pickle.dumps(cp)), cp)
+
+        alias = CurveParameters("secp256r1")
+        self.assertIsNot(alias, cp)
+        self.assertEqual(alias, cp)
+        self.assertEqual(hash(alias), hash(cp))
+        self.assertEqual(alias.to_json(), '{"curve_name": "secp256r1"}')
+        self.assertNotEqual(CurveParameters("P-384"), cp)
+
+    def test_curve_parameter_mul_base(self):
+        for scalar in [0, 1, 2, 255, 256, self.cp.order - 1, self.cp.order + 5]:
+            self.assertEqual(self.cp.mul_base(scalar), self.cp.P * scalar)
+
+        r = number.random_in_range(2, self.cp.order)
+        self.assertEqual(self.cp.mul_base(r), r * self.cp.P)
+
+    def test_fixed_base_table(self):
+        point = number.random_in_range(2, self.cp.order) * self.cp.P
+        table = number.FixedBaseTable(point, self.cp.order, window=4)
+        r = number.random_in_range(2, self.cp.order)
+
+        self.assertEqual(table.size, 64 * 15)
+        self.assertEqual(table.multiply(r), r * point)
+
+        # zero digits add a dummy point which must not end up in the result
+        for scalar in [0, 1, 16, 0x100F, 2**200, self.cp.order - 1, self.cp.order]:
+            self.assertEqual(table.multiply(scalar), scalar * point)
+
     def test_central_key_generation(self):
         pk, shares = central.create_public_key_and_shares_centralized(self.cp, self.tp)
 
         self.assertEqual(len(shares), self.tp.n)
 
+    def test_central_key_generation_batches(self):
+        tp = ThresholdParameters(3, 11)
+        pk, share_batches = central.create_public_key_and_share_batches_centralized(
+            self.cp, tp, batch_size=4
+        )
+        batches = list(share_batches)
+
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 3])
+        shares = [share for batch in batches for share in batch]
+        self.assertEqual([share.x for share in shares], list(range(1, tp.n + 1)))
+        self.assertEqual(
+            self.cp.mul_base(central._restore_priv_key(self.cp, shares[5:], tp)), pk.Q
+        )
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.create_public_key_and_share_batches_centralized(
+                self.cp, tp, batch_size=0
+            )
+
+    def test_central_key_generation_with_sink(self):
+        tp = ThresholdParameters(3, 7)
+        written = []
+        pk = central.create_public_key_and_write_shares_centralized(
+            self.cp,
+            tp,
+            sink=lambda batch: written.append([s.to_json() for s in batch]),
+            batch_size=5,
+        )
+
+        self.assertEqual([len(batch) for batch in written], [5, 2])
+        shares = [KeyShare.from_json(s) for batch in written for s in batch]
+        em = central.encrypt_message(self.message, pk)
+        partial_decryptions = [
+            participant.compute_partial_decryption(em, share) for share in shares[2:5]
+        ]
+        self.assertEqual(
+            central.decrypt_message(partial_decryptions, em, tp), self.message
+        )
+
     def test_public_key_json(self):
         pk_j = PublicKey.from_json(self.pk.to_json())
 
         self.assertEqual(self.pk, pk_j)
 
+    def test_prepared_public_key(self):
+        prepared_pk = PublicKey(self.pk.Q, self.cp).prepare()
+        r = number.random_in_range(2, self.cp.order)
+
+        self.assertTrue(prepared_pk.prepared)
+        self.assertFalse(self.pk.prepared)
+        self.assertEqual(prepared_pk.mul_Q(r), r * self.pk.Q)
+        self.assertEqual(prepared_pk, self.pk)
+        self.assertEqual(prepared_pk.to_json(), self.pk.to_json())
+
+        em = central.encrypt_message(self.message, prepared_pk)
+        partial_decryptions = [
+            participant.compute_partial_decryption(em, share)
+            for share in self.reconstruct_shares
+        ]
+        self.assertEqual(
+            central.decrypt_message(partial_decryptions, em, self.tp), self.message
+        )
+
+        for window in [0, PublicKey.MAX_PREPARED_WINDOW + 1]:
+            with self.assertRaises(ThresholdCryptoError):
+                PublicKey(self.pk.Q, self.cp).prepare(window)
+
     def test_key_share_json(self):
         share = self.shares[0]
         share_j = KeyShare.from_json(share.to_json())
@@ -93,6 +209,428 @@ class TCTestCase(unittest.TestCase):
         self.assertTrue(em.C2)
         self.assertTrue(em.ciphertext)
 
+    def test_encrypt_messages(self):
+        messages = ["message {}".format(i) for i in range(0, 10)]
+
+        for workers in [1, 2]:
+            ems = list(
+                central.encrypt_messages(
+                    iter(messages), self.pk, workers=workers, chunk_size=3
+                )
+            )
+
+            self.assertEqual(len(ems), len(messages))
+            for message, em in zip(messages, ems):
+                partial_decryptions = [
+                    participant.compute_partial_decryption(em, share)
+                    for share in self.reconstruct_shares
+                ]
+                self.assertEqual(
+                    central.decrypt_message(partial_decryptions, em, self.tp), message
+                )
+
+        self.assertFalse(self.pk.prepared)
+
+    def test_encryption_pool(self):
+        with central.EncryptionPool(self.pk, size=8, refill_threshold=2) as pool:
+            ems = [pool.encrypt_message(self.message) for _ in range(0, 20)]
+
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(len({em.to_json() for em in ems}), len(ems))
+
+        for em in ems:
+            partial_decryptions = [
+                participant.compute_partial_decryption(em, share)
+                for share in self.reconstruct_shares
+            ]
+            self.assertEqual(
+                central.decrypt_message(partial_decryptions, em, self.tp), self.message
+            )
+
+    def test_encryption_pool_fill_and_fallback(self):
+        pool = central.EncryptionPool(self.pk, size=4, start=False)
+        pool.fill(3)
+        self.assertEqual(len(pool), 3)
+
+        ems = [pool.encrypt_message(self.message) for _ in range(0, 5)]
+
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(pool.inline_computations, 2)
+        self.assertEqual(len({em.to_json() for em in ems}), len(ems))
+
+    def test_encryption_pool_invalid_parameters(self):
+        with self.assertRaises(ThresholdCryptoError):
+            central.EncryptionPool(self.pk, size=0, start=False)
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.EncryptionPool(self.pk, size=4, refill_threshold=4, start=False)
+
+    def test_bytes_encryption(self):
+        payload = bytes(range(256)) * 4
+        buffer = mmap.mmap(-1, len(payload))
+        buffer.write(payload)
+
+        sources = [
+            payload,
+            bytearray(payload),
+            memoryview(b"xx" + payload)[2:],
+            buffer,
+            array.array("H", payload),
+        ]
+        for source in sources:
+            em = central.encrypt_bytes(source, self.pk)
+            partial_decryptions = [
+                participant.compute_partial_decryption(em, share)
+                for share in self.reconstruct_shares
+            ]
+            decrypted = central.decrypt_bytes(partial_decryptions, em, self.tp)
+
+            self.assertIsInstance(decrypted, bytes)
+            self.assertEqual(decrypted, payload)
+
+        buffer.close()
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.decrypt_bytes(self.partial_decryptions[:2], self.em, self.tp)
+
+    def test_bytes_encryption_compatibility(self):
+        # the ciphertext has the format of SecretBox and messages and bytes can be decrypted either way
+        self.assertEqual(
+            central.decrypt_bytes(self.partial_decryptions, self.em, self.tp),
+            self.message.encode("utf-8"),
+        )
+
+        key_point = central._restore_key_point(self.partial_decryptions, self.em)
+        box = nacl.secret.SecretBox(central._symmetric_key(key_point))
+        self.assertEqual(box.decrypt(self.em.ciphertext), self.message.encode("utf-8"))
+
+        em = EncryptedMessage(self.em.C1, self.em.C2, box.encrypt(b"\x00\xff"))
+        self.assertEqual(
+            central.decrypt_bytes(self.partial_decryptions, em, self.tp), b"\x00\xff"
+        )
+
+        with central.EncryptionPool(self.pk, size=2, start=False) as pool:
+            em = pool.encrypt_bytes(b"")
+        partial_decryptions = [
+            participant.compute_partial_decryption(em, share)
+            for share in self.reconstruct_shares
+        ]
+        self.assertEqual(central.decrypt_bytes(partial_decryptions, em, self.tp), b"")
+
+        manipulated = bytearray(em.ciphertext)
+        manipulated[-1] ^= 1
+        em = EncryptedMessage(em.C1, em.C2, bytes(manipulated))
+        with self.assertRaises(ThresholdCryptoError):
+            central.decrypt_bytes(partial_decryptions, em, self.tp)
+
+    def test_key_encapsulation(self):
+        C1, C2, dek = central.encapsulate(self.pk)
+        self.assertEqual(len(dek), nacl.secret.SecretBox.KEY_SIZE)
+
+        capsule = EncryptedMessage.from_bytes(EncryptedMessage(C1, C2, b"").to_bytes())
+        box = nacl.secret.SecretBox(dek)
+        records = [box.encrypt(bytes([i]) * 10) for i in range(0, 5)]
+
+        for indices in [[0, 2, 4], [1, 2, 3, 4]]:
+            partial_decryptions = [
+                participant.compute_partial_decryption(capsule, self.shares[i])
+                for i in indices
+            ]
+            recovered = central.decapsulate(
+                partial_decryptions, capsule.C1, capsule.C2, self.tp
+            )
+
+            self.assertEqual(recovered, dek)
+            box = nacl.secret.SecretBox(recovered)
+            for i, record in enumerate(records):
+                self.assertEqual(box.decrypt(record), bytes([i]) * 10)
+
+        self.assertNotEqual(central.encapsulate(self.pk)[2], dek)
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.decapsulate(partial_decryptions[:2], C1, C2, self.tp)
+
+    def test_multi_recipient_encryption(self):
+        tp_2 = ThresholdParameters(2, 3)
+        pk_2, shares_2 = central.create_public_key_and_shares_centralized(self.cp, tp_2)
+        pk_3, _ = central.create_public_key_and_shares_centralized(self.cp, self.tp)
+
+        mre = central.encrypt_message_for_recipients(
+            self.message, [self.pk, pk_2, pk_3]
+        )
+        self.assertEqual(mre.recipients, [self.pk.Q, pk_2.Q, pk_3.Q])
+
+        # the payload is encrypted once for all recipients
+        em = central.encrypt_message(self.message, self.pk)
+        self.assertEqual(len(mre.ciphertext), len(em.ciphertext))
+
+        for mre in [
+            mre,
+            MultiRecipientEncryptedMessage.from_json(mre.to_json()),
+            MultiRecipientEncryptedMessage.from_json(mre.to_json(), lazy=True),
+            ThresholdDataClass.from_bytes(mre.to_bytes()),
+        ]:
+            for pk, shares, tp in [
+                (self.pk, self.shares, self.tp),
+                (pk_2, shares_2, tp_2),
+            ]:
+                em = mre.for_recipient(pk)
+                partial_decryptions = [
+                    participant.compute_partial_decryption(em, share)
+                    for share in shares[: tp.t]
+                ]
+
+                self.assertEqual(
+                    central.decrypt_message(partial_decryptions, em, tp), self.message
+                )
+                self.assertEqual(
+                    central.decrypt_message(partial_decryptions, mre, tp), self.message
+                )
+
+        pk_4, shares_4 = central.create_public_key_and_shares_centralized(
+            self.cp, self.tp
+        )
+        with self.assertRaises(ThresholdCryptoError):
+            mre.for_recipient(pk_4)
+
+        partial_decryptions = [
+            participant.compute_partial_decryption(mre.for_recipient(self.pk), share)
+            for share in shares_4[:3]
+        ]
+        with self.assertRaises(ThresholdCryptoError):
+            central.decrypt_message(partial_decryptions, mre, self.tp)
+
+    def test_multi_recipient_encryption_invalid_parameters(self):
+        pk_ed, _ = central.create_public_key_and_shares_centralized(
+            CurveParameters("Ed25519"), self.tp
+        )
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.encrypt_bytes_for_recipients(b"data", [])
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.encrypt_bytes_for_recipients(b"data", [self.pk, pk_ed])
+
+        with self.assertRaises(ThresholdCryptoError):
+            MultiRecipientEncryptedMessage([self.pk.Q], [], [], b"")
+
+    def _stream_partial_decryptions(self, em):
+        return [
+            participant.compute_partial_decryption(em, share)
+            for share in self.reconstruct_shares
+        ]
+
+    def test_stream_encryption(self):
+        payload = bytes(range(256)) * 40
+
+        sources = [
+            payload,
+            bytearray(payload),
+            memoryview(payload),
+            io.BytesIO(payload),
+            iter([payload[i : i + 100] for i in range(0, len(payload), 100)]),
+        ]
+        for source in sources:
+            encrypted = io.BytesIO()
+            em = central.encrypt_stream(source, encrypted, self.pk, chunk_size=1000)
+
+            decrypted = io.BytesIO()
+            written = central.decrypt_stream(
+                self._stream_partial_decryptions(em),
+                em,
+                io.BytesIO(encrypted.getvalue()),
+                decrypted,
+                self.tp,
+            )
+
+            self.assertEqual(decrypted.getvalue(), payload)
+            self.assertEqual(written, len(payload))
+            # 11 chunks with a length prefix and an authentication tag each
+            self.assertEqual(len(encrypted.getvalue()), len(payload) + 11 * (4 + 17))
+
+    def test_stream_encryption_empty_payload(self):
+        encrypted = io.BytesIO()
+        em = central.encrypt_stream(b"", encrypted, self.pk)
+
+        decrypted = io.BytesIO()
+        central.decrypt_stream(
+            self._stream_partial_decryptions(em),
+            em,
+            encrypted.getvalue(),
+            decrypted,
+            self.tp,
+        )
+
+        self.assertEqual(decrypted.getvalue(), b"")
+
+    def test_stream_encryption_after_re_encryption_and_json(self):
+        payload = b"streamed payload" * 100
+        encrypted = io.BytesIO()
+        em = central.encrypt_stream(payload, encrypted, self.pk, chunk_size=64)
+        em = EncryptedMessage.from_json(em.to_json())
+
+        decrypted = io.BytesIO()
+        central.decrypt_stream(
+            self._stream_partial_decryptions(em),
+            em,
+            encrypted.getvalue(),
+            decrypted,
+            self.tp,
+        )
+
+        self.assertEqual(decrypted.getvalue(), payload)
+
+    def test_stream_decryption_failures(self):
+        payload = b"streamed payload" * 100
+        encrypted = io.BytesIO()
+        em = central.encrypt_stream(payload, encrypted, self.pk, chunk_size=64)
+        partial_decryptions = self._stream_partial_decryptions(em)
+        data = encrypted.getvalue()
+        frame_size = 4 + 64 + 17
+
+        manipulated = bytearray(data)
+        manipulated[10] ^= 1
+        failing_sources = [
+            # truncated inside a frame
+            data[:-1],
+            # last chunk with the final tag missing
+            data[:-frame_size],
+            # chunks in wrong order
+            data[frame_size : 2 * frame_size]
+            + data[:frame_size]
+            + data[2 * frame_size :],
+            # appended chunk
+            data + data[:frame_size],
+            bytes(manipulated),
+        ]
+        for source in failing_sources:
+            with self.assertRaises(ThresholdCryptoError):
+                central.decrypt_stream(
+                    partial_decryptions, em, source, io.BytesIO(), self.tp
+                )
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.decrypt_stream(
+                partial_decryptions[:2], em, data, io.BytesIO(), self.tp
+            )
+
+        # a regular encrypted message holds no stream header
+        with self.assertRaises(ThresholdCryptoError):
+            central.decrypt_stream(
+                self.partial_decryptions, self.em, data, io.BytesIO(), self.tp
+            )
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.encrypt_stream(payload, io.BytesIO(), self.pk, chunk_size=0)
+
+    def test_partial_decryption_batch(self):
+        ems = [
+            central.encrypt_message("message {}".format(i), self.pk)
+            for i in range(0, 10)
+        ]
+        ems.append(EncryptedMessage.from_json(ems[0].to_json(), lazy=True))
+
+        for workers in [1, 2]:
+            batches = [
+                participant.compute_partial_decryptions(
+                    ems, share, workers=workers, chunk_size=3
+                )
+                for share in self.reconstruct_shares
+            ]
+
+            for i, em in enumerate(ems):
+                for share, batch in zip(self.reconstruct_shares, batches):
+                    self.assertEqual(
+                        batch[i], participant.compute_partial_decryption(em, share)
+                    )
+
+                self.assertEqual(
+                    central.decrypt_message(
+                        [batch[i] for batch in batches], em, self.tp
+                    ),
+                    "message {}".format(i % 10),
+                )
+
+        batch = batches[0]
+        self.assertEqual(len(batch), len(ems))
+        self.assertEqual(list(batch), [batch[i] for i in range(0, len(batch))])
+        self.assertEqual(PartialDecryptionBatch.from_json(batch.to_json()), batch)
+        self.assertEqual(ThresholdDataClass.from_bytes(batch.to_bytes()), batch)
+        # x and the curve are stored once
+        self.assertLess(len(batch.to_bytes()), sum(len(pd.to_bytes()) for pd in batch))
+        self.assertLess(len(batch.to_json()), sum(len(pd.to_json()) for pd in batch))
+
+        empty = participant.compute_partial_decryptions([], self.shares[0])
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(PartialDecryptionBatch.from_bytes(empty.to_bytes()), empty)
+
+    def test_decrypt_messages(self):
+        messages = ["message {}".format(i) for i in range(0, 8)]
+        ems = [central.encrypt_message(message, self.pk) for message in messages]
+        batches = [
+            participant.compute_partial_decryptions(ems, share)
+            for share in self.reconstruct_shares
+        ]
+        partials_by_message = [list(partials) for partials in zip(*batches)]
+
+        # multi-recipient messages are decrypted one by one
+        mre = central.encrypt_message_for_recipients("multi", [self.pk])
+        messages.append("multi")
+        ems.append(mre)
+        partials_by_message.append(
+            [
+                participant.compute_partial_decryption(
+                    mre.for_recipient(self.pk), share
+                )
+                for share in self.reconstruct_shares
+            ]
+        )
+
+        for workers in [1, 2]:
+            self.assertEqual(
+                central.decrypt_messages(
+                    partials_by_message, ems, self.tp, workers=workers
+                ),
+                messages,
+            )
+
+    def test_decrypt_messages_failures(self):
+        messages = ["message {}".format(i) for i in range(0, 6)]
+        ems = [central.encrypt_message(message, self.pk) for message in messages]
+        partials_by_message = [
+            [
+                participant.compute_partial_decryption(em, share)
+                for share in self.reconstruct_shares
+            ]
+            for em in ems
+        ]
+
+        # manipulated ciphertext
+        ems[1] = EncryptedMessage(ems[1].C1, ems[1].C2, ems[1].ciphertext[:-1] + b"x")
+        # not enough partial decryptions
+        partials_by_message[2] = partials_by_message[2][:2]
+        # partial decryptions of another message
+        partials_by_message[3] = partials_by_message[4]
+        # no valid UTF-8
+        ems[5] = central.encrypt_bytes(b"\xff", self.pk)
+        partials_by_message[5] = [
+            participant.compute_partial_decryption(ems[5], share)
+            for share in self.reconstruct_shares
+        ]
+
+        for workers in [1, 2]:
+            results = central.decrypt_messages(
+                partials_by_message, ems, self.tp, workers=workers
+            )
+
+            self.assertEqual(results[0], messages[0])
+            self.assertEqual(results[4], messages[4])
+            for i in [1, 2, 3, 5]:
+                self.assertIsInstance(results[i], ThresholdCryptoError)
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.decrypt_messages(partials_by_message[:2], ems, self.tp)
+
     def test_message_json(self):
         m_j = EncryptedMessage.from_json(self.em.to_json())
 
@@ -104,6 +642,223 @@ class TCTestCase(unittest.TestCase):
 
         self.assertEqual(pd, pd_j)
 
+    def test_json_format(self):
+        em = EncryptedMessage(self.cp.P, self.cp.P, b"\x00\x01")
+        point = '{{"x": {}, "y": {}, "curve": "NIST P-256"}}'.format(
+            int(self.cp.P.x), int(self.cp.P.y)
+        )
+
+        self.assertEqual(
+            em.to_json(),
+            '{{"C1": {}, "C2": {}, "ciphertext": "BASE64|AAE="}}'.format(point, point),
+        )
+        self.assertEqual(
+            KeyShare(1, 2, self.cp).to_json(),
+            '{"x": 1, "y": 2, "curve_params": "ECURVE|P-256"}',
+        )
+
+        # objects with curve parameters write their points with the curve name given by the caller
+        for curve_name in ["P-256", "secp256r1"]:
+            cp = CurveParameters(curve_name)
+            point = '{{"x": {}, "y": {}, "curve": "{}"}}'.format(
+                int(cp.P.x), int(cp.P.y), curve_name
+            )
+            self.assertEqual(
+                PublicKey(cp.P, cp).to_json(),
+                '{{"Q": {}, "curve_params": "ECURVE|{}"}}'.format(point, curve_name),
+            )
+            self.assertEqual(PublicKey.from_json(PublicKey(cp.P, cp).to_json()).Q, cp.P)
+
+    def test_key_epoch_tag(self):
+        untagged = self.em.to_bytes()
+
+        for key_epoch in [0, 1, 300]:
+            em = EncryptedMessage(self.em.C1, self.em.C2, self.em.ciphertext, key_epoch)
+            self.assertNotEqual(em, self.em)
+            self.assertEqual(EncryptedMessage.from_json(em.to_json()), em)
+            self.assertEqual(EncryptedMessage.from_bytes(em.to_bytes()), em)
+            self.assertEqual(em.to_bytes()[: len(untagged)], untagged)
+            self.assertEqual(
+                sequence_from_bytes(sequence_to_bytes([em, self.em, em])),
+                [em, self.em, em],
+            )
+
+        # untagged messages keep their encodings
+        self.assertIsNone(EncryptedMessage.from_bytes(untagged).key_epoch)
+        self.assertNotIn("key_epoch", self.em.to_json())
+
+        with self.assertRaises(ThresholdCryptoError):
+            EncryptedMessage(self.em.C1, self.em.C2, self.em.ciphertext, -1)
+
+    def test_key_epoch_encryption(self):
+        ems = [
+            central.encrypt_message(self.message, self.pk, key_epoch=2),
+            central.encrypt_bytes(b"data", self.pk, key_epoch=2),
+            central.encrypt_stream(b"data", io.BytesIO(), self.pk, key_epoch=2),
+        ]
+        ems.extend(
+            central.encrypt_messages(
+                ["a", "b"], self.pk, workers=2, chunk_size=1, key_epoch=2
+            )
+        )
+        ems.extend(central.encrypt_messages(["a"], self.pk, workers=1, key_epoch=2))
+        with central.EncryptionPool(self.pk, size=2) as pool:
+            ems.append(pool.encrypt_message(self.message, key_epoch=2))
+            ems.append(pool.encrypt_bytes(b"data", key_epoch=2))
+
+        self.assertEqual([em.key_epoch for em in ems], [2] * len(ems))
+        self.assertIsNone(central.encrypt_message(self.message, self.pk).key_epoch)
+
+    def test_slotted_data_classes(self):
+        coefficients = central.lagrange_coefficients([1, 3, 5], self.cp)
+        objects = [self.tp, self.cp, self.pk, self.shares[0], self.em]
+        objects.extend(coefficients + self.partial_decryptions)
+
+        for obj in objects:
+            self.assertFalse(hasattr(obj, "__dict__"))
+
+        self.assertIs(
+            coefficients[0].used_index_values, coefficients[1].used_index_values
+        )
+
+    def test_lagrange_coefficient_json(self):
+        lc = central.lagrange_coefficients([1, 3, 5], self.cp)[1]
+        lc_j = LagrangeCoefficient.from_json(lc.to_json())
+
+        self.assertEqual(lc, lc_j)
+
+    def test_lazy_json(self):
+        em_j = self.em.to_json()
+        em = EncryptedMessage.from_json(em_j, lazy=True)
+
+        # forwarding requires no decoding
+        self.assertEqual(em.to_json(), em_j)
+        self.assertIsInstance(em.C1, group.LazyEccPoint)
+        self.assertNotIn("_point", vars(em.C1))
+
+        partial_decryptions = [
+            PartialDecryption.from_json(pd.to_json(), lazy=True)
+            for pd in self.partial_decryptions
+        ]
+        for pd in partial_decryptions:
+            pd.validate()
+
+        self.assertEqual(
+            central.decrypt_message(partial_decryptions, em, self.tp), self.message
+        )
+        self.assertEqual(em, self.em)
+
+    def test_lazy_json_invalid_point(self):
+        em_j = self.em.to_json().replace(
+            str(int(self.em.C2.y)), str(int(self.em.C2.y) + 1)
+        )
+        em = EncryptedMessage.from_json(em_j, lazy=True)
+
+        with self.assertRaises(ThresholdCryptoError):
+            em.validate()
+        with self.assertRaises(ThresholdCryptoError):
+            central.decrypt_message(self.partial_decryptions, em, self.tp)
+
+        em_j = self.em.to_json().replace(
+            str(int(self.em.C1.y)), str(int(self.em.C1.y) + 1)
+        )
+        em = EncryptedMessage.from_json(em_j, lazy=True)
+
+        with self.assertRaises(ThresholdCryptoError):
+            participant.compute_partial_decryption(em, self.shares[0])
+        with self.assertRaises(ThresholdCryptoError):
+            participant.compute_partial_decryptions([self.em, em], self.shares[0])
+        with self.assertRaises(ThresholdCryptoError):
+            participant.compute_partial_decryptions(
+                [self.em, em], self.shares[0], workers=2, chunk_size=1
+            )
+        with self.assertRaises(ThresholdCryptoError):
+            central.re_encrypt_message(em, ReEncryptionKey(1, self.cp))
+
+    def test_binary_format(self):
+        lc = central.lagrange_coefficients([1, 3, 5], self.cp)[0]
+        objects = [self.tp, self.cp, self.pk, self.shares[0], self.em, lc]
+        objects.append(self.partial_decryptions[0])
+
+        for obj in objects:
+            for compressed in [True, False]:
+                data = obj.to_bytes(compressed)
+                self.assertEqual(obj.__class__.from_bytes(data), obj)
+                self.assertEqual(ThresholdDataClass.from_bytes(data), obj)
+
+        for obj in [self.em, self.partial_decryptions[0]]:
+            self.assertLess(len(obj.to_bytes()), len(obj.to_json()) / 2)
+            self.assertLess(len(obj.to_bytes()), len(obj.to_bytes(compressed=False)))
+
+    def test_binary_point_encoding(self):
+        for curve_name in ["P-192", "P-224", "P-256", "P-521", "Ed25519", "Ed448"]:
+            backend = CurveParameters(curve_name).backend
+            points = [backend.point_at_infinity(), backend.generator()]
+            points.extend(
+                number.random_in_range(2, backend.order) * backend.generator()
+                for _ in range(5)
+            )
+
+            for point in points:
+                for compressed in [True, False]:
+                    data = b"prefix" + backend.encode_point(point, compressed)
+                    self.assertEqual(
+                        backend.decode_point(data, len(b"prefix")),
+                        (point, len(data)),
+                    )
+
+    def test_affine_coordinates(self):
+        for curve_name in [
+            "P-256",
+            "P-521",
+            "Ed25519",
+            "Ed448",
+            group.LIBSODIUM_ED25519,
+        ]:
+            backend = CurveParameters(curve_name).backend
+            points = [
+                number.random_in_range(2, backend.order) * backend.generator()
+                for _ in range(5)
+            ]
+            points.append(backend.point_at_infinity())
+            points.append(backend.lazy_point(*points[0].xy))
+            expected = [(int(p.x), int(p.y)) for p in points]
+
+            self.assertEqual(group.affine_coordinates(points), expected)
+
+        self.assertEqual(group.affine_coordinates([]), [])
+
+    def test_binary_format_invalid_data(self):
+        data = self.em.to_bytes()
+
+        invalid = [
+            b"",
+            data[:-1],
+            data + b"\x00",
+            bytes([0]) + data[1:],  # unknown format version
+            data[:2] + bytes([255]) + data[3:],  # unknown curve id
+            data[:3] + bytes([5]) + data[4:],  # invalid point encoding
+        ]
+        for invalid_data in invalid:
+            with self.assertRaises(ThresholdCryptoError):
+                EncryptedMessage.from_bytes(invalid_data)
+
+        with self.assertRaises(ThresholdCryptoError):
+            PartialDecryption.from_bytes(data)
+
+        with self.assertRaises(ThresholdCryptoError):
+            DkgFijValue(1, [self.cp.P, CurveParameters("P-384").P]).to_bytes()
+
+    def test_binary_sequence(self):
+        objects = [self.em] + self.partial_decryptions + [self.tp]
+        data = sequence_to_bytes(objects)
+
+        self.assertEqual(sequence_from_bytes(data), objects)
+        self.assertEqual(sequence_from_bytes(b""), [])
+
+        with self.assertRaises(ThresholdCryptoError):
+            sequence_from_bytes(data[:-1])
+
     # TBD: further tests
 
     def test_polynom_creation(self):
@@ -112,10 +867,102 @@ class TCTestCase(unittest.TestCase):
         self.assertTrue(p.degree == 5)
         self.assertTrue(p.evaluate(0) == 17)
 
+    def test_polynom_evaluation(self):
+        q = self.cp.order
+        p = number.PolynomMod.create_random_polynom(17, 10, q)
+        xs = [0, 1, 2, 41, 100000000, q + 3]
+
+        expected = [
+            sum(c * pow(x, j) for j, c in enumerate(p.coefficients)) % q for x in xs
+        ]
+        self.assertEqual([p.evaluate(x) for x in xs], expected)
+        self.assertEqual(p.evaluate_many(xs), expected)
+        self.assertEqual(p.evaluate_many([]), [])
+
+    def test_ecc_copy(self):
+        for curve_name in ["P-256", "Ed25519", group.LIBSODIUM_ED25519]:
+            cp = CurveParameters(curve_name)
+            point = cp.mul_base(5)
+            lazy = cp.backend.lazy_point(*group.affine_coordinates([point])[0])
+
+            for original in [point, lazy, number.ecc_point_at_infinity(curve_name)]:
+                copy = number.ecc_copy(original)
+                self.assertEqual(copy, original)
+                self.assertEqual(copy.curve, original.curve)
+
+                # the copy is independent of the original
+                expected = original + cp.P
+                copy += cp.P
+                self.assertEqual(copy, expected)
+                self.assertNotEqual(copy, original)
+
+    def test_multi_scalar_mul(self):
+        # the sizes cover Straus' method with both window sizes and Pippenger's method
+        for size in [1, 5, 20, 70]:
+            points = [
+                self.cp.mul_base(number.random_in_range(1, self.cp.order))
+                for _ in range(0, size)
+            ]
+            scalars = [number.random_in_range(0, self.cp.order) for _ in range(0, size)]
+            scalars[0] = 0
+            expected = number.ecc_sum([k * p for k, p in zip(scalars, points)])
+
+            self.assertEqual(number.multi_scalar_mul(scalars, points), expected)
+
+        self.assertIsNone(number.multi_scalar_mul([], []))
+
+        with self.assertRaises(ValueError):
+            number.multi_scalar_mul([1, 2], [self.cp.P])
+
+    def test_batch_mod_inv(self):
+        values = [number.random_in_range(1, self.cp.order - 1) for _ in range(0, 10)]
+        inverses = number.batch_mod_inv(values, self.cp.order)
+
+        for value, inverse in zip(values, inverses):
+            self.assertEqual(value * inverse % self.cp.order, 1)
+
+        with self.assertRaises(ValueError):
+            number.batch_mod_inv([3, self.cp.order], self.cp.order)
+
+    def test_lagrange_coefficients(self):
+        q = self.cp.order
+        indices = [3, 17, 5, 100000000]
+        lcs = central.lagrange_coefficients(indices, self.cp)
+
+        for i, lc in enumerate(lcs):
+            expected = (
+                number.prod(
+                    [
+                        -x_j * number.prime_mod_inv(indices[i] - x_j, q)
+                        for j, x_j in enumerate(indices)
+                        if j != i
+                    ]
+                )
+                % q
+            )
+            self.assertEqual(lc.participant_index, indices[i])
+            self.assertEqual(lc.coefficient, expected)
+            self.assertEqual(
+                lc,
+                central.lagrange_coefficient_for_key_share_indices(
+                    indices, indices[i], self.cp
+                ),
+            )
+
+        # the coefficients interpolate the constant term
+        self.assertEqual(sum(lc.coefficient for lc in lcs) % q, 1)
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.lagrange_coefficients([1, 2, 2], self.cp)
+        with self.assertRaises(ThresholdCryptoError):
+            central.lagrange_coefficients([1, 2, 2 + q], self.cp)
+        with self.assertRaises(ThresholdCryptoError):
+            central.lagrange_coefficient_for_key_share_indices([1, 1 + q], 1, self.cp)
+
     def test_key_encryption_decryption_with_enough_shares(self):
         r = number.random_in_range(2, self.cp.order)
         testkey_element = r * self.cp.P
-        kP, c = central._encrypt_key_point(testkey_element, self.pk.Q, self.cp)
+        kP, c = central._encrypt_key_point(testkey_element, self.pk)
         em = EncryptedMessage(kP, c, b"")
         reconstruct_shares = [
             self.shares[i] for i in [0, 2, 4]
@@ -131,7 +978,7 @@ class TCTestCase(unittest.TestCase):
     def test_key_encryption_decryption_without_enough_shares(self):
         r = number.random_in_range(2, self.cp.order)
         testkey_element = r * self.cp.P
-        kP, c = central._encrypt_key_point(testkey_element, self.pk.Q, self.cp)
+        kP, c = central._encrypt_key_point(testkey_element, self.pk)
         em = EncryptedMessage(kP, c, b"")
         reconstruct_shares = [
             self.shares[i] for i in [0, 4]
@@ -191,6 +1038,140 @@ class TCTestCase(unittest.TestCase):
             )
 
 
+class LibsodiumBackendTestCase(unittest.TestCase):
+    """
+    Test cases for the scheme running on the libsodium Ed25519 backend.
+    """
+
+    def setUp(self):
+        self.tp = ThresholdParameters(3, 5)
+        self.cp = CurveParameters(curve_name=group.LIBSODIUM_ED25519)
+        self.pk, self.shares = central.create_public_key_and_shares_centralized(
+            self.cp, self.tp
+        )
+        self.message = "Some secret message"
+
+    def test_point_arithmetic(self):
+        backend = self.cp.backend
+        P = self.cp.P
+        zero = backend.point_at_infinity()
+
+        self.assertEqual(3 * P, P + P + P)
+        self.assertEqual(P * self.cp.order, zero)
+        self.assertEqual(zero * 5, zero)
+        self.assertEqual(P + (-P), zero)
+        self.assertEqual(P.copy().double(), 2 * P)
+        self.assertEqual(backend.point(*(7 * P).xy), 7 * P)
+        self.assertTrue(zero.is_point_at_infinity())
+
+        x, y = P.xy
+        with self.assertRaises(ValueError):
+            backend.point(x, y + 1)
+
+    def test_curve_parameter_json(self):
+        cp_j = CurveParameters.from_json(self.cp.to_json())
+
+        self.assertEqual(self.cp, cp_j)
+        self.assertNotEqual(self.cp, CurveParameters())
+
+    def test_lazy_json(self):
+        em = central.encrypt_message(self.message, self.pk)
+        em_l = EncryptedMessage.from_json(em.to_json(), lazy=True)
+
+        self.assertEqual(em_l.to_json(), em.to_json())
+        partial_decryptions = [
+            participant.compute_partial_decryption(em_l, share)
+            for share in self.shares[:3]
+        ]
+        self.assertEqual(
+            central.decrypt_message(partial_decryptions, em_l, self.tp), self.message
+        )
+
+    def test_partial_decryption_batch(self):
+        ems = [central.encrypt_message(self.message, self.pk) for _ in range(0, 5)]
+
+        for workers in [1, 2]:
+            batch = participant.compute_partial_decryptions(
+                ems, self.shares[0], workers=workers, chunk_size=2
+            )
+
+            self.assertEqual(
+                list(batch),
+                [
+                    participant.compute_partial_decryption(em, self.shares[0])
+                    for em in ems
+                ],
+            )
+            self.assertEqual(ThresholdDataClass.from_bytes(batch.to_bytes()), batch)
+
+    def test_binary_format(self):
+        em = central.encrypt_message(self.message, self.pk)
+        pd = participant.compute_partial_decryption(em, self.shares[0])
+
+        for obj in [self.cp, self.pk, self.shares[0], em, pd]:
+            self.assertEqual(obj.__class__.from_bytes(obj.to_bytes()), obj)
+
+        # libsodium encodings are compressed already
+        self.assertEqual(em.to_bytes(), em.to_bytes(compressed=False))
+
+        # non-canonical encoding
+        data = pd.to_bytes()[:-32] + bytes([0xFF] * 32)
+        with self.assertRaises(ThresholdCryptoError):
+            PartialDecryption.from_bytes(data)
+
+    def test_complete_process(self):
+        em = central.encrypt_message(self.message, self.pk)
+        em_j = EncryptedMessage.from_json(em.to_json())
+        self.assertEqual(em, em_j)
+
+        partial_decryptions = [
+            PartialDecryption.from_json(
+                participant.compute_partial_decryption(em_j, share).to_json()
+            )
+            for share in self.shares[1:4]
+        ]
+
+        self.assertEqual(
+            central.decrypt_message(partial_decryptions, em_j, self.tp), self.message
+        )
+
+    def test_distributed_key_generation(self):
+        participant_ids = list(range(1, self.tp.n + 1))
+        participants = [
+            participant.Participant(id, participant_ids, self.cp, self.tp)
+            for id in participant_ids
+        ]
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_closed_commitment(pj.closed_commitment())
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_open_commitment(pj.open_commitment())
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_F_ij_value(pj.F_ij_value())
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_sij(pj.s_ij_value_for_participant(pi.id))
+
+        shares = [p.compute_share() for p in participants]
+        public_key = participants[0].compute_public_key()
+
+        em = central.encrypt_message(self.message, public_key)
+        pdms = [
+            participant.compute_partial_decryption(em, ks) for ks in shares[: self.tp.t]
+        ]
+        self.assertEqual(central.decrypt_message(pdms, em, self.tp), self.message)
+
+
 class PreTestCase(unittest.TestCase):
     """
     Test cases for the proxy reencryption scheme.
@@ -227,6 +1208,14 @@ class PreTestCase(unittest.TestCase):
 
         self.assertEqual(rek, rek_j)
 
+    def test_re_encryption_keys_binary(self):
+        prek = PartialReEncryptionKey(partial_key=17, curve_params=self.cp)
+        rek = ReEncryptionKey(key=self.cp.order - 1, curve_params=self.cp)
+
+        self.assertEqual(PartialReEncryptionKey.from_bytes(prek.to_bytes()), prek)
+        self.assertEqual(ReEncryptionKey.from_bytes(rek.to_bytes()), rek)
+        self.assertEqual(len(rek.to_bytes()), 3 + 32)
+
     def test_re_encryption_process_for_same_access_structures(self):
         self.parameterizable_re_encryption_process_test(self.tp.t, self.tp.n)
 
@@ -242,6 +1231,314 @@ class PreTestCase(unittest.TestCase):
     def test_re_encryption_process_for_larger_threshold(self):
         self.parameterizable_re_encryption_process_test(self.tp.t + 1, self.tp.n)
 
+    def _new_access_structure(self, pk=None, shares=None):
+        # change the access structure of (pk, shares), defaults to the one of setUp
+        pk = pk or self.pk
+        shares = shares or self.shares
+        new_pk, new_shares = central.create_public_key_and_shares_centralized(
+            self.cp, self.tp
+        )
+        indices = [share.x for share in shares[: self.tp.t]]
+        partial_keys = [
+            participant.compute_partial_re_encryption_key(
+                old_share,
+                central.lagrange_coefficient_for_key_share_indices(
+                    indices, old_share.x, self.cp
+                ),
+                new_share,
+                central.lagrange_coefficient_for_key_share_indices(
+                    indices, new_share.x, self.cp
+                ),
+            )
+            for old_share, new_share in zip(shares, new_shares[: self.tp.t])
+        ]
+        re_key = central.combine_partial_re_encryption_keys(
+            partial_keys, pk, new_pk, self.tp, self.tp
+        )
+
+        return new_pk, new_shares, re_key
+
+    def _decrypt(self, em, shares):
+        partial_decryptions = [
+            participant.compute_partial_decryption(em, share)
+            for share in shares[: self.tp.t]
+        ]
+        return central.decrypt_message(partial_decryptions, em, self.tp)
+
+    def test_re_encrypt_store(self):
+        _, new_shares, re_key = self._new_access_structure()
+        messages = ["message {}".format(i) for i in range(0, 7)]
+
+        for workers in [1, 2]:
+            store = [central.encrypt_message(message, self.pk) for message in messages]
+            C1s = [em.C1 for em in store]
+            reports = []
+
+            stats = central.re_encrypt_store(
+                store, re_key, workers=workers, chunk_size=3, progress=reports.append
+            )
+
+            self.assertEqual(stats.processed, len(messages))
+            self.assertEqual(stats.resumed, 0)
+            self.assertEqual(len(reports), 3)
+            self.assertGreater(stats.throughput, 0)
+            self.assertEqual([em.C1 for em in store], C1s)
+            self.assertEqual([self._decrypt(em, new_shares) for em in store], messages)
+
+        em = central.encrypt_message(self.message, self.pk)
+        (re_em,) = central.re_encrypt_messages([em], re_key, workers=1)
+        self.assertIs(re_em, em)
+        self.assertEqual(self._decrypt(re_em, new_shares), self.message)
+
+    def test_re_encryption_checkpoint(self):
+        _, new_shares, re_key = self._new_access_structure()
+        messages = ["message {}".format(i) for i in range(0, 7)]
+
+        class InterruptedStore(list):
+            # stores serialized messages like a database and fails writing at one index
+            fail_index = None
+
+            def __getitem__(self, index):
+                return EncryptedMessage.from_json(super().__getitem__(index))
+
+            def __setitem__(self, index, em):
+                if index == self.fail_index:
+                    raise KeyboardInterrupt()
+                super().__setitem__(index, em.to_json())
+
+            def __iter__(self):
+                return (self[index] for index in range(0, len(self)))
+
+        store = InterruptedStore(
+            central.encrypt_message(message, self.pk).to_json() for message in messages
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_path = os.path.join(directory, "checkpoint.json")
+
+            store.fail_index = 3
+            with self.assertRaises(KeyboardInterrupt):
+                central.re_encrypt_store(
+                    store,
+                    re_key,
+                    workers=1,
+                    chunk_size=3,
+                    checkpoint_path=checkpoint_path,
+                )
+
+            store.fail_index = None
+            stats = central.re_encrypt_store(
+                store, re_key, workers=1, chunk_size=3, checkpoint_path=checkpoint_path
+            )
+            self.assertEqual(stats.resumed, 3)
+            self.assertEqual(stats.processed, 4)
+            self.assertEqual([self._decrypt(em, new_shares) for em in store], messages)
+
+            # a finished job is not repeated
+            stats = central.re_encrypt_store(
+                store, re_key, checkpoint_path=checkpoint_path
+            )
+            self.assertEqual(stats.processed, 0)
+            self.assertEqual([self._decrypt(em, new_shares) for em in store], messages)
+
+            _, _, other_re_key = self._new_access_structure()
+            with self.assertRaises(ThresholdCryptoError):
+                central.re_encrypt_store(
+                    store, other_re_key, checkpoint_path=checkpoint_path
+                )
+
+            with open(checkpoint_path, "w") as f:
+                f.write("{")
+            with self.assertRaises(ThresholdCryptoError):
+                central.re_encrypt_store(store, re_key, checkpoint_path=checkpoint_path)
+
+    def test_compose_re_encryption_keys(self):
+        pk_b, shares_b, re_key_ab = self._new_access_structure()
+        pk_c, shares_c, re_key_bc = self._new_access_structure(pk_b, shares_b)
+        pk_d, shares_d, re_key_cd = self._new_access_structure(pk_c, shares_c)
+
+        re_key_ad = central.compose_re_encryption_keys(
+            [re_key_ab, re_key_bc, re_key_cd], self.pk, pk_d
+        )
+        re_em = central.re_encrypt_message(self.em, re_key_ad)
+        self.assertEqual(self._decrypt(re_em, shares_d), self.message)
+
+        hop_em = self.em
+        for re_key in [re_key_ab, re_key_bc, re_key_cd]:
+            hop_em = central.re_encrypt_message(hop_em, re_key)
+        self.assertEqual(re_em, hop_em)
+
+        # single key
+        self.assertEqual(
+            central.compose_re_encryption_keys([re_key_ab], self.pk, pk_b), re_key_ab
+        )
+
+        with self.assertRaises(ThresholdCryptoError):
+            central.compose_re_encryption_keys([], self.pk, pk_d)
+        with self.assertRaises(ThresholdCryptoError):
+            central.compose_re_encryption_keys([re_key_ab, re_key_cd], self.pk, pk_d)
+        with self.assertRaises(ThresholdCryptoError):
+            central.compose_re_encryption_keys([re_key_ab, re_key_bc], self.pk, pk_d)
+        with self.assertRaises(ThresholdCryptoError):
+            central.compose_re_encryption_keys(
+                [re_key_ab, ReEncryptionKey(1, CurveParameters("Ed25519"))],
+                self.pk,
+                pk_c,
+            )
+
+    def test_key_epoch_registry(self):
+        registry = central.KeyEpochRegistry(self.pk)
+        self.assertEqual(registry.current_epoch, 0)
+
+        pk, shares = self.pk, self.shares
+        epoch_shares = [shares]
+        for epoch in range(1, 4):
+            pk, shares, re_key = self._new_access_structure(pk, shares)
+            self.assertEqual(registry.add_epoch(pk, re_key), epoch)
+            epoch_shares.append(shares)
+
+        self.assertEqual(registry.current_epoch, 3)
+        self.assertEqual(registry.public_key(0), self.pk)
+        self.assertEqual(registry.public_key(3), pk)
+
+        # catching up from any epoch is a single re-encryption
+        for from_epoch in range(0, 4):
+            em = central.encrypt_message(self.message, registry.public_key(from_epoch))
+            re_key = registry.re_encryption_key(from_epoch)
+            self.assertIs(registry.re_encryption_key(from_epoch, 3), re_key)
+            re_em = central.re_encrypt_message(em, re_key)
+            self.assertEqual(self._decrypt(re_em, shares), self.message)
+
+        re_em = central.re_encrypt_message(self.em, registry.re_encryption_key(0, 2))
+        self.assertEqual(self._decrypt(re_em, epoch_shares[2]), self.message)
+        self.assertEqual(registry.re_encryption_key(1, 1).key, 0)
+
+        with self.assertRaises(ThresholdCryptoError):
+            registry.re_encryption_key(0, 4)
+        with self.assertRaises(ThresholdCryptoError):
+            registry.re_encryption_key(-1)
+
+        # the re-encryption key has to start at the current epoch
+        new_pk, _, new_re_key = self._new_access_structure()
+        with self.assertRaises(ThresholdCryptoError):
+            registry.add_epoch(new_pk, new_re_key)
+        self.assertEqual(registry.current_epoch, 3)
+
+    def test_re_encrypt_on_read(self):
+        registry = central.KeyEpochRegistry(self.pk)
+        pk, shares = self.pk, self.shares
+        em = central.encrypt_message(self.message, self.pk, key_epoch=0)
+        store = {"message": em}
+
+        def write_back(re_em):
+            store["message"] = re_em
+
+        # no rotation yet
+        self.assertIs(central.re_encrypt_on_read(em, registry, write_back), em)
+
+        for _ in range(0, 3):
+            pk, shares, re_key = self._new_access_structure(pk, shares)
+            registry.add_epoch(pk, re_key)
+
+        # without write back the stored message stays in epoch 0
+        re_em = central.re_encrypt_on_read(store["message"], registry)
+        self.assertEqual(re_em.key_epoch, 3)
+        self.assertEqual(self._decrypt(re_em, shares), self.message)
+        self.assertIs(store["message"], em)
+        self.assertEqual(em.key_epoch, 0)
+
+        re_em = central.re_encrypt_on_read(store["message"], registry, write_back)
+        self.assertIs(store["message"], re_em)
+        self.assertEqual(
+            EncryptedMessage.from_json(re_em.to_json()).key_epoch,
+            registry.current_epoch,
+        )
+        self.assertIs(central.re_encrypt_on_read(re_em, registry, write_back), re_em)
+        self.assertEqual(self._decrypt(re_em, shares), self.message)
+
+        # untagged messages are left alone
+        self.assertIs(central.re_encrypt_on_read(self.em, registry), self.em)
+
+        em.key_epoch = 4
+        with self.assertRaises(ThresholdCryptoError):
+            central.re_encrypt_on_read(em, registry)
+
+    def test_re_encryption_key_epochs(self):
+        registry = central.KeyEpochRegistry(self.pk)
+        pk, shares = self.pk, self.shares
+        for _ in range(0, 2):
+            pk, shares, re_key = self._new_access_structure(pk, shares)
+            registry.add_epoch(pk, re_key)
+        re_key_01 = registry.re_encryption_key(0, 1)
+        messages = ["message {}".format(i) for i in range(0, 7)]
+
+        def tagged_store():
+            return [
+                central.encrypt_message(message, self.pk, key_epoch=0)
+                for message in messages
+            ]
+
+        # bulk re-encryption to epoch 1 followed by re-encryption on read to epoch 2
+        for workers in [1, 2]:
+            store = tagged_store()
+            central.re_encrypt_store(
+                store, re_key_01, workers=workers, chunk_size=3, key_epochs=(0, 1)
+            )
+            self.assertEqual([em.key_epoch for em in store], [1] * len(messages))
+
+            read = [central.re_encrypt_on_read(em, registry) for em in store]
+            self.assertEqual([em.key_epoch for em in read], [2] * len(messages))
+            self.assertEqual([self._decrypt(em, shares) for em in read], messages)
+
+        # tagged messages are not re-encrypted without matching key epochs
+        em = central.encrypt_message(self.message, self.pk, key_epoch=0)
+        with self.assertRaises(ThresholdCryptoError):
+            central.re_encrypt_store([em], re_key_01)
+        with self.assertRaises(ThresholdCryptoError):
+            central.re_encrypt_message(em, re_key_01)
+        with self.assertRaises(ThresholdCryptoError):
+            central.re_encrypt_message(em, registry.re_encryption_key(1, 2), (1, 2))
+        self.assertEqual(em.key_epoch, 0)
+
+        re_em = central.re_encrypt_message(em, re_key_01, (0, 1))
+        self.assertEqual(re_em.key_epoch, 1)
+        self.assertIs(central.re_encrypt_message(re_em, re_key_01, (0, 1)), re_em)
+
+        # untagged messages are tagged with the target epoch
+        re_em = central.re_encrypt_message(self.em, re_key_01, (0, 1))
+        self.assertEqual(re_em.key_epoch, 1)
+        self.assertEqual(
+            self._decrypt(central.re_encrypt_on_read(re_em, registry), shares),
+            self.message,
+        )
+
+        # messages written back after the last checkpoint are not re-encrypted twice
+        store = tagged_store()
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_path = os.path.join(directory, "checkpoint.json")
+            re_encrypted = central.re_encrypt_messages(
+                store,
+                re_key_01,
+                workers=1,
+                chunk_size=3,
+                checkpoint_path=checkpoint_path,
+                key_epochs=(0, 1),
+            )
+            next(re_encrypted)
+            next(re_encrypted)
+            re_encrypted.close()
+
+            stats = central.re_encrypt_store(
+                store,
+                re_key_01,
+                checkpoint_path=checkpoint_path,
+                key_epochs=(0, 1),
+            )
+            self.assertEqual(stats.resumed, 0)
+
+        read = [central.re_encrypt_on_read(em, registry) for em in store]
+        self.assertEqual([self._decrypt(em, shares) for em in read], messages)
+
     def parameterizable_re_encryption_process_test(self, new_t: int, new_n: int):
         new_tp = ThresholdParameters(new_t, new_n)
         new_pk, new_shares = central.create_public_key_and_shares_centralized(
@@ -345,6 +1642,18 @@ class DkgTestCase(unittest.TestCase):
 
         self.assertEqual(f, f_j)
 
+    def test_dkg_values_binary(self):
+        values = [
+            DkgClosedCommitment(1, bytes(32)),
+            DkgOpenCommitment(1, bytes(32), self.cp.P, bytes(range(32))),
+            DkgFijValue(1, [self.cp.P, 2 * self.cp.P]),
+            DkgFijValue(2, []),
+            DkgSijValue(1, 2, self.cp.order - 1),
+        ]
+
+        for value in values:
+            self.assertEqual(value.__class__.from_bytes(value.to_bytes()), value)
+
     def test_distributed_key_generation(self):
         participant_ids = list(range(1, self.tp.n + 1))
         participants = [
@@ -494,6 +1803,122 @@ class DkgTestCase(unittest.TestCase):
 
             participants[1].receive_sij(s_ij)
 
+    def _run_dkg_until_sij(self, participants):
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_closed_commitment(pj.closed_commitment())
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_open_commitment(pj.open_commitment())
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_F_ij_value(pj.F_ij_value())
+
+    def test_deferred_s_ij_verification(self):
+        participant_ids = list(range(1, self.tp.n + 1))
+        participants = [
+            participant.Participant(
+                id, participant_ids, self.cp, self.tp, defer_sij_verification=True
+            )
+            for id in participant_ids
+        ]
+        self._run_dkg_until_sij(participants)
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_sij(pj.s_ij_value_for_participant(pi.id))
+
+        for pi in participants:
+            pi.verify_all_sij()
+
+        shares = [p.compute_share() for p in participants]
+        public_key = participants[0].compute_public_key()
+
+        em = central.encrypt_message(self.message, public_key)
+        pdms = [
+            participant.compute_partial_decryption(em, ks) for ks in shares[: self.tp.t]
+        ]
+        self.assertEqual(central.decrypt_message(pdms, em, self.tp), self.message)
+
+    def test_lazy_dkg_messages(self):
+        participant_ids = list(range(1, self.tp.n + 1))
+        participants = [
+            participant.Participant(id, participant_ids, self.cp, self.tp)
+            for id in participant_ids
+        ]
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_closed_commitment(pj.closed_commitment())
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    c_j = pj.open_commitment().to_json()
+                    pi.receive_open_commitment(
+                        DkgOpenCommitment.from_json(c_j, lazy=True)
+                    )
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    f = DkgFijValue.from_json(pj.F_ij_value().to_json(), lazy=True)
+                    f.validate()
+                    pi.receive_F_ij_value(f)
+
+        for pi in participants:
+            for pj in participants:
+                if pj != pi:
+                    pi.receive_sij(pj.s_ij_value_for_participant(pi.id))
+
+        shares = [p.compute_share() for p in participants]
+        public_key = participants[0].compute_public_key()
+        for p in participants[1:]:
+            self.assertEqual(p.compute_public_key(), public_key)
+
+        em = central.encrypt_message(self.message, public_key)
+        pdms = [
+            participant.compute_partial_decryption(em, ks) for ks in shares[: self.tp.t]
+        ]
+        self.assertEqual(central.decrypt_message(pdms, em, self.tp), self.message)
+
+    def test_deferred_compromised_s_ij_value(self):
+        participant_ids = list(range(1, self.tp.n + 1))
+        participants = [
+            participant.Participant(
+                id, participant_ids, self.cp, self.tp, defer_sij_verification=True
+            )
+            for id in participant_ids
+        ]
+        self._run_dkg_until_sij(participants)
+
+        target = participants[1]
+        for pj in participants:
+            if pj != target:
+                s_ij = pj.s_ij_value_for_participant(target.id)
+
+                # tamper with s_ij of participant 4
+                if pj.id == 4:
+                    s_ij.s_ij = 2 * s_ij.s_ij % self.cp.order
+
+                target.receive_sij(s_ij)
+
+        with self.assertRaises(ThresholdCryptoError) as context:
+            target.verify_all_sij()
+
+        self.assertIn("[4]", str(context.exception))
+
+        # the invalid value stays unverified
+        with self.assertRaises(ThresholdCryptoError):
+            target.compute_share()
+
     def test_not_enough_open_commitments(self):
         participant_ids = list(range(1, self.tp.n + 1))
         participants = [